@@ -0,0 +1,83 @@
+import numpy as np
+from scipy.special import logsumexp
+
+"""
+Exact equilibrium of the bound-pair model.
+
+The weight of every state n = 0..N is known in closed form (main.log_weight_table),
+so pi(n) is the normalized weight table, normalized in log space so that it does
+not overflow. From pi come the exact moments and independent draws, either by
+inverting the CDF (binary search, O(log N) per draw) or with an alias table
+(O(N) to build, O(1) per draw). These are the reference the Metropolis chains of
+metropolis.py can be checked against.
+"""
+
+def equilibrium_distribution(log_weights):
+    """
+    :param log_weights: log-weight of every state n = 0..N
+    :return: pi(n), array summing to 1
+    """
+    log_weights = np.asarray(log_weights, dtype=float)
+    return np.exp(log_weights - logsumexp(log_weights))
+
+def moments(pi):
+    """
+    :param pi: probabilities of n = 0..N
+    :return: dict with the mean, variance and standard deviation of n
+    """
+    n = np.arange(len(pi))
+    mean = np.dot(n, pi)
+    var = np.dot((n - mean)**2, pi)
+    return {"mean": mean, "var": var, "std": np.sqrt(var)}
+
+def sample_inverse_cdf(pi, size, rng=None):
+    """
+    Independent draws of n by inverting the CDF.
+
+    :param pi: probabilities of n = 0..N
+    :param size: number (or shape) of draws
+    :param rng: numpy Generator or seed
+    :return: array of draws
+    """
+    rng = rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
+    cdf = np.cumsum(pi)
+    draws = np.searchsorted(cdf, rng.random(size) * cdf[-1], side="right")
+    return np.minimum(draws, len(pi) - 1)
+
+class AliasTable:
+    """
+    Walker's alias method: each n gets a column holding probability prob[n] of
+    itself and the rest of another state alias[n], so a draw is one uniform column
+    and one uniform comparison.
+    """
+
+    def __init__(self, pi):
+        """
+        :param pi: probabilities of n = 0..N (need not be normalized)
+        """
+        pi = np.asarray(pi, dtype=float)
+        K = len(pi)
+        scaled = pi * K / pi.sum()
+        self.prob = np.ones(K)
+        self.alias = np.arange(K)
+
+        small = [i for i in range(K) if scaled[i] < 1.0]
+        large = [i for i in range(K) if scaled[i] >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s], self.alias[s] = scaled[s], l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # whatever is left is 1 up to rounding
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def sample(self, size, rng=None):
+        """
+        :param size: number (or shape) of draws
+        :param rng: numpy Generator or seed
+        :return: array of draws
+        """
+        rng = rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
+        column = rng.integers(len(self.prob), size=size)
+        return np.where(rng.random(size) < self.prob[column], column, self.alias[column])
@@ -1,7 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from math import comb, factorial
 from scipy.integrate import solve_ivp
+from scipy.special import gammaln
+from metropolis import run_chains, summary
+from exact import equilibrium_distribution, moments
 
 # CONSTANTS:
 N_A = 130
@@ -9,10 +11,27 @@ N_B = 100
 N = min(N_A, N_B)
 energy = -np.log(1/(N_A*N_B)) # INTERESTING: -np.log(1/(30*20))
 
+def log_weight_table(N_A, N_B, energy):
+    """
+    Log of the unnormalized weight comb(N_A, n) * comb(N_B, n) * n! * exp(-energy*n)
+    of the microstates with n = 0..min(N_A, N_B) bound pairs. Computed once with
+    lgamma, so it neither overflows nor needs big integers for large N_A and N_B.
+
+    :param N_A: number of A particles
+    :param N_B: number of B particles
+    :param energy: energy of a bond
+    :return: array of log-weights indexed by n
+    """
+    n = np.arange(min(N_A, N_B) + 1)
+    return (gammaln(N_A + 1) - gammaln(N_A - n + 1) + gammaln(N_B + 1) - gammaln(N_B - n + 1)
+            - gammaln(n + 1) - energy*n)
+
+log_weights = log_weight_table(N_A, N_B, energy)
+
 def microstate_weight(n):
     """Calculate the unnormalized weight of a microstate with n bound pairs."""
     
-    return comb(N_A, n) * comb(N_B, n) * factorial(n) * np.exp(-energy*n)
+    return np.exp(log_weights[n])
 
 def update_system(n_current):
     """Update the system by randomly choosing to bind or unbind a pair."""
@@ -25,10 +44,13 @@ def update_system(n_current):
         step = 1 if np.random.rand() < 0.5 else -1
         proposed_move = n_current + step
 
-    # Acceptance probability
-    w_current = microstate_weight(n_current)
-    w_proposed = microstate_weight(proposed_move)
-    acceptance_prob = min(1, w_proposed / w_current)
+    # Acceptance probability, from the difference of the log-weights. The moves from
+    # n = 0 and n = N are forced, so the proposal is not symmetric there and the
+    # ratio of the reverse and forward proposal probabilities (Hastings) is included
+    log_q_forward = 0.0 if n_current in (0, N) else np.log(0.5)
+    log_q_reverse = 0.0 if proposed_move in (0, N) else np.log(0.5)
+    log_ratio = log_weights[proposed_move] - log_weights[n_current] + log_q_reverse - log_q_forward
+    acceptance_prob = np.exp(min(0.0, log_ratio))
 
     # Accept or reject the move
     if np.random.rand() < acceptance_prob:
@@ -36,19 +58,6 @@ def update_system(n_current):
     else:
         return n_current
 
-# Simulation parameters
-num_steps = 1000
-n = 0 # Initial number of bound pairs
-history = [n]
-
-# Run Metropolis-Hastings
-for step in range(num_steps):
-    n = update_system(n)
-    history.append(n)
-
-history = np.array(history)
-
-
 def odes(t,y):
     """
     Return odes for the system.
@@ -57,31 +66,49 @@ def odes(t,y):
     :param y: state vector
     :return: odes
     """
-    n = y
+    n = y[0]
 
     dn = (N_A - n) * (N_B - n) - np.exp(energy) * n
 
     return [dn]
 
-y0 = np.array([0.0])
-t_span = (0, 1000)
-t_eval = np.linspace(*t_span, 1000)
-sol = solve_ivp(odes, t_span, y0, t_eval=t_eval, method='LSODA')
-
-plt.plot(sol.t, sol.y[0])
-plt.title("ODE solution for number of AB bonds over time")
-plt.xlabel("Time")
-plt.ylabel("Number of AB bonds (n)")
-plt.show()
-print(f"ODE steady-state number of bonds: {sol.y[0][-1]}")
-
-# Plotting the results
-plt.hist(history, bins=N+1, density=True, alpha=0.6, color='skyblue', edgecolor='black')
-plt.xlabel("Number of AB bonds (n)")
-plt.ylabel("Probability")
-plt.title("Metropolis-Hastings sampling of π(n)")
-plt.show()
-
-# Average number of bonds
-mean_n = np.mean(history)
-print("Average number of AB bonds:", mean_n)
+if __name__ == "__main__":
+    # Simulation parameters
+    num_chains = 1000 # Chains run in parallel
+    num_steps = 2000 # Steps kept per chain
+    burn_in = 500 # Steps discarded at the start of each chain
+    thin = 1 # Keep every thin-th step
+    n = 0 # Initial number of bound pairs
+
+    # Run Metropolis-Hastings
+    history = run_chains(log_weights, num_chains, num_steps, burn_in=burn_in, thin=thin, n0=n, rng=12345)
+    stats = summary(history)
+    pi = equilibrium_distribution(log_weights) # Exact reference
+    exact = moments(pi)
+    print(f"R-hat: {stats['r_hat']:.4f}, autocorrelation time: {stats['tau']:.2f} steps, "
+          f"effective sample size: {stats['ess']:.0f}")
+
+    y0 = np.array([0.0])
+    t_span = (0, 1000)
+    t_eval = np.linspace(*t_span, 1000)
+    sol = solve_ivp(odes, t_span, y0, t_eval=t_eval, method='LSODA')
+
+    plt.plot(sol.t, sol.y[0])
+    plt.title("ODE solution for number of AB bonds over time")
+    plt.xlabel("Time")
+    plt.ylabel("Number of AB bonds (n)")
+    plt.show()
+    print(f"ODE steady-state number of bonds: {sol.y[0][-1]}")
+
+    # Plotting the results
+    plt.hist(history.ravel(), bins=np.arange(N + 2) - 0.5, density=True, alpha=0.6, color='skyblue', edgecolor='black')
+    plt.plot(np.arange(N + 1), pi, 'o', color='red', label="Exact π(n)")
+    plt.xlim(-0.5, max(history.max(), np.searchsorted(np.cumsum(pi), 1 - 1e-6)) + 0.5)
+    plt.legend()
+    plt.xlabel("Number of AB bonds (n)")
+    plt.ylabel("Probability")
+    plt.title(f"Metropolis-Hastings sampling of π(n) ({num_chains} chains)")
+    plt.show()
+
+    # Average number of bonds
+    print(f"Average number of AB bonds: {stats['mean']} ± {stats['stderr']} (exact: {exact['mean']})")
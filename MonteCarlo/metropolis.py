@@ -0,0 +1,154 @@
+import numpy as np
+
+"""
+Metropolis-Hastings for the bound-pair model, with many chains advanced at once.
+
+Every chain makes the same moves as update_system in main.py (propose n +- 1 with
+probability 1/2, only +1 at n = 0 and only -1 at n = N, accept from the difference
+of the log-weights plus the Hastings correction for the forced moves at the ends),
+but the state of all chains is one array and each step is a few array operations.
+The proposal directions and acceptance uniforms are drawn in blocks of steps.
+
+In Barker mode the move to n +- 1 is instead accepted with probability
+w(new) / (w(n) + w(new)) (moves off the ends are refused). In heat-bath mode each
+step draws n from its full conditional distribution, by inverting its CDF. The
+model has a single coordinate, so that conditional is pi(n) itself and the draws
+are independent. In multi-species versions of the model this is the update made
+for one species at a time, from the conditional weights of that species given the
+others.
+
+The diagnostics take the kept samples as an array of shape (n_samples, n_chains):
+split R-hat (close to 1 when the chains agree), the integrated autocorrelation time
+(steps between effectively independent samples) and the effective sample size.
+"""
+
+def run_chains(log_weights, n_chains, n_steps, burn_in=0, thin=1, n0=0, rng=None, block_size=256,
+               mode="metropolis"):
+    """
+    Advance n_chains independent chains in parallel.
+
+    :param log_weights: log-weight of every state n = 0..N (see main.log_weight_table)
+    :param n_chains: number of chains
+    :param n_steps: number of steps kept after the burn-in (before thinning)
+    :param burn_in: number of steps discarded at the start
+    :param thin: keep every thin-th step
+    :param n0: initial state of every chain (int or array of length n_chains)
+    :param rng: numpy Generator or seed
+    :param block_size: number of steps whose random numbers are drawn at once
+    :param mode: "metropolis", "barker" or "heat_bath"
+    :return: kept samples, array of shape (n_steps // thin, n_chains)
+    """
+    if mode not in ("metropolis", "barker", "heat_bath"):
+        raise ValueError(f"Unknown mode: {mode!r}")
+    rng = rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
+    log_weights = np.asarray(log_weights, dtype=float)
+    N = len(log_weights) - 1
+    # Moves off the ends have weight 0 in Barker mode
+    padded = np.concatenate([[-np.inf], log_weights, [-np.inf]])
+    n = np.broadcast_to(np.asarray(n0, dtype=int), (n_chains,)).copy()
+    samples = np.empty((n_steps // thin, n_chains), dtype=int)
+
+    # log of the probability of each proposal made from state m (1 at the ends, 1/2 elsewhere)
+    log_q = np.full(N + 1, np.log(0.5))
+    log_q[[0, N]] = 0.0
+
+    # Unnormalized CDF of the full conditional, for heat-bath mode
+    cdf = np.cumsum(np.exp(log_weights - log_weights.max()))
+
+    total = burn_in + n_steps
+    step = 0
+    while step < total:
+        block = min(block_size, total - step)
+        if mode == "heat_bath":
+            draws = np.searchsorted(cdf, rng.random((block, n_chains)) * cdf[-1], side="right")
+            draws = np.minimum(draws, N)
+        else:
+            up = rng.random((block, n_chains)) < 0.5
+            log_u = np.log(rng.random((block, n_chains)))
+        for i in range(block):
+            if mode == "heat_bath":
+                n = draws[i]
+            elif mode == "barker":
+                # accept with probability w(proposed) / (w(n) + w(proposed))
+                proposed = np.where(up[i], n + 1, n - 1)
+                delta = padded[proposed + 1] - padded[n + 1]
+                n = np.where(log_u[i] < delta - np.logaddexp(0.0, delta), proposed, n)
+            else:
+                # +1 or -1 with equal probability, forced at the ends
+                proposed = np.where(up[i], n + 1, n - 1)
+                proposed[n == 0] = 1
+                proposed[n == N] = N - 1
+                accept = log_u[i] < log_weights[proposed] - log_weights[n] + log_q[proposed] - log_q[n]
+                n = np.where(accept, proposed, n)
+
+            kept = step - burn_in
+            if kept >= 0 and kept % thin == thin - 1 and kept // thin < len(samples):
+                samples[kept // thin] = n
+            step += 1
+    return samples
+
+def r_hat(samples):
+    """
+    Split R-hat of the chains: each chain is split in two halves and the variance
+    between the halves is compared with the variance within them.
+
+    :param samples: array of shape (n_samples, n_chains)
+    :return: R-hat (nan if every chain is constant)
+    """
+    half = len(samples) // 2
+    halves = np.concatenate([samples[:half], samples[half:2 * half]], axis=1).astype(float)
+    within = halves.var(axis=0, ddof=1).mean()
+    between = halves.mean(axis=0).var(ddof=1)
+    if within == 0:
+        return np.nan
+    var_hat = (half - 1) / half * within + between
+    return np.sqrt(var_hat / within)
+
+def autocorrelation(samples):
+    """
+    Autocorrelation function averaged over the chains (computed with the FFT).
+
+    :param samples: array of shape (n_samples, n_chains)
+    :return: rho(t) for t = 0..n_samples-1
+    """
+    x = samples - samples.mean(axis=0)
+    n = len(x)
+    f = np.fft.rfft(x, n=2 * n, axis=0)
+    autocov = np.fft.irfft(f * np.conj(f), axis=0)[:n].mean(axis=1)
+    return autocov / autocov[0] if autocov[0] > 0 else np.full(n, np.nan)
+
+def integrated_autocorr_time(samples, c=5.0):
+    """
+    Integrated autocorrelation time tau = 1 + 2 sum_t rho(t), summed up to the first
+    window M with M >= c * tau(M) (Sokal's automatic windowing).
+
+    :param samples: array of shape (n_samples, n_chains)
+    :param c: window constant
+    :return: tau, in units of kept samples
+    """
+    rho = autocorrelation(samples)
+    if np.isnan(rho[0]):
+        return np.nan
+    taus = 2 * np.cumsum(rho) - 1
+    windows = np.arange(len(taus))
+    ok = windows >= c * taus
+    return taus[np.argmax(ok)] if ok.any() else taus[-1]
+
+def effective_sample_size(samples):
+    """Number of kept samples divided by the integrated autocorrelation time."""
+    return samples.size / integrated_autocorr_time(samples)
+
+def summary(samples):
+    """
+    Estimate of the mean with its convergence diagnostics.
+
+    :param samples: array of shape (n_samples, n_chains)
+    :return: dict with mean, stderr (from the effective sample size), r_hat, tau and ess
+    """
+    tau = integrated_autocorr_time(samples)
+    ess = samples.size / tau
+    return {"mean": samples.mean(),
+            "stderr": samples.std() / np.sqrt(ess),
+            "r_hat": r_hat(samples),
+            "tau": tau,
+            "ess": ess}
@@ -1,10 +1,14 @@
-import math
-import random
+import os
+import sys
 import numpy as np
 from scipy.integrate import solve_ivp
 import matplotlib.pyplot as plt
 from collections import OrderedDict
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "refactored_four_square"))
+import ssa as _ssa
+from trajectory import Trajectory
+
 """
 Testing SSA from paper. The structure we study is the following:
 
@@ -186,140 +190,24 @@ for ri, rxn in enumerate(reactions):
     for s, cnt in rxn.get("reactants", {}).items():
         stoich_changes[ri, idx[s]] -= cnt
 
-# Calculating propensities
-def compute_propensities(counts, reactant_lists, rates, reactions):
-    """
-    counts: 1D array of species counts
-    reactant_lists: list of lists of (species_index, stoich)
-    rates: dict of k's
-    reactions: original reactions list (to get k key)
-    """
-    a = np.zeros(len(reactant_lists), dtype=float)
-    for i, rlist in enumerate(reactant_lists):
-        k_key = reactions[i]["k"]
-        k = rates[k_key] # Get rate constant
-
-        # If no reactants (shouldn't happen here), propensity = k
-        if len(rlist) == 0:
-            a[i] = k
-            continue
-
-        term = 1.0
-        feasible = True
-
-        for s_idx, _ in rlist:  # reactant stoich is always 1
-            n = counts[s_idx]
-            if n < 1:
-                feasible = False
-                break
-            term *= n # Account for multiple reactants
-
-        a[i] = k * term if feasible else 0.0
-
-    return a
-
-# Gillespie Algorithm
+# Gillespie Algorithm (the engines live in the refactored folder and take the network as arguments)
 def gillespie_ssa(initial_counts, t_max, reactions, reactant_lists, stoich_changes, rates,
-                  max_steps=int(1e9)):
+                  max_steps=int(1e9), rng=None, observers=(), record_history=True):
     """
     Runs SSA until t_max or max_steps.
+    rng: numpy Generator or seed, for reproducible runs.
+    observers: e.g. a FirstPassageRecorder, see ssa.gillespie_ssa.
     Returns times array and history dict mapping species->list
     """
-    counts = np.array(initial_counts, dtype=int)
-    t = 0.0
-
-    # history
-    history = {s: [counts[idx_s]] for idx_s, s in enumerate(species)}
-    times = [t]
-
-    for step in range(max_steps):
-        a = compute_propensities(counts, reactant_lists, rates, reactions)
-        a0 = a.sum()
-        if a0 <= 0.0:
-            # no more reactions possible
-            #print("DEBUG: stopping early because a0 == 0 at t =", t)
-            #print(" final counts:", counts)
-            break
-
-        # draw two random numbers
-        r1 = random.random()
-        r2 = random.random()
-
-        # time to next reaction
-        tau = -math.log(r1) / a0
-        t += tau
-
-        if t > t_max:
-            # we stop; do not apply reaction that would go beyond t_max
-            break
-
-        # choose reaction by cumulative sum
-        cum = np.cumsum(a) # [a1, a1+a2, a1+a2+a3, ...]
-        target = r2 * a0 # target ~ Unif(0,a0)
-        ri = np.searchsorted(cum, target) # Reaction index
-
-        # update species counts
-        counts += stoich_changes[ri]
-
-        # record
-        for idx_s, s in enumerate(species):
-            history[s].append(int(counts[idx_s]))
-        times.append(t)
-
-    return np.array(times), history
+    return _ssa.gillespie_ssa(initial_counts, t_max, species, reactions, reactant_lists,
+                              stoich_changes, rates, max_steps=max_steps, observers=observers,
+                              record_history=record_history, rng=rng)
 
 # Same algorithm but keeps track of every event in a log
 def gillespie_ssa_with_log(initial_counts, t_max, reactions, reactant_lists, stoich_changes, rates,
-                        max_steps=int(1e7)):
-    counts = np.array(initial_counts, dtype=int)
-    t = 0.0
-
-    history = {s: [counts[idx_s]] for idx_s, s in enumerate(species)}
-    times = [t]
-    events = []  # list of dicts: {"t":..., "ri":..., "name":..., "counts": array}
-
-    for step in range(max_steps):
-        a = compute_propensities(counts, reactant_lists, rates, reactions)
-        a0 = a.sum()
-        if a0 <= 0.0:
-            # record final state and break
-            events.append({"t": t, "ri": None, "name": "STOP_no_propensity", "counts": counts.copy()})
-            break
-
-        r1 = random.random()
-        r2 = random.random()
-        tau = -math.log(r1) / a0
-        t += tau
-        if t > t_max:
-            # stop (we do not apply the reaction that would pass t_max)
-            events.append({"t": t_max, "ri": None, "name": "STOP_tmax_reached", "counts": counts.copy()})
-            # append final time to history
-            times.append(t_max)
-            for idx_s, s in enumerate(species):
-                history[s].append(int(counts[idx_s]))
-            break
-
-        # choose reaction
-        cum = np.cumsum(a)
-        target = r2 * a0
-        ri = np.searchsorted(cum, target)
-        # apply reaction stoichiometry
-        counts += stoich_changes[ri]
-
-        # record event
-        events.append({
-            "t": t,
-            "ri": ri,
-            "name": f"r{ri+1}_{reactions[ri]['k']}",
-            "counts": counts.copy()
-        })
-
-        # save history
-        times.append(t)
-        for idx_s, s in enumerate(species):
-            history[s].append(int(counts[idx_s]))
-
-    return np.array(times), history, events
+                        max_steps=int(1e7), rng=None):
+    return _ssa.gillespie_ssa_with_log(initial_counts, t_max, species, reactions, reactant_lists,
+                                       stoich_changes, rates, max_steps=max_steps, rng=rng)
 
 
 def odes(t,y):
@@ -443,13 +331,11 @@ if __name__ == "__main__":
         "Tetramers": tetramers,
     }
 
-    # Helper to get snapshot index
-    def nearest_index(array, value):
-        return np.argmin(np.abs(array - value)) # Index where this is minimized
+    # State in force at each snapshot time
+    snapshots = Trajectory.from_history(times, history, species).resample(snapshot_times)
 
-    for t_snap in snapshot_times:
-        idx_snap = nearest_index(times, t_snap)
-        state = {s: history[s][idx_snap] for s in species}
+    for t_snap, snapshot in zip(snapshot_times, snapshots):
+        state = dict(zip(species, snapshot))
 
         # ---------------------------------------------------
         # Correct total: count total molecules (monomer units)
@@ -1,34 +1,38 @@
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 from four_square import (gillespie_ssa, species, idx,
  reactions, reactant_lists, stoich_changes, rates)
 
+# Shared engines live in the refactored folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "refactored_four_square"))
+from network import CompiledNetwork
+from lna import solve_moments, group_stats
+from trajectory import Trajectory
+from analysis import size_weight_matrix, mass_fractions
+
 """
 In the all-forward experiment, check how the system size affects the proportion of each species.
 """
 
 if __name__ == "__main__":
     num_runs = 100
+    seed = 12345
     duration = 5
     t_eval = np.linspace(0, duration, 1000)
     system_sizes = [40, 100, 200, 400, 800, 1000, 2000, 4000, 10000]
+    use_lna = False # !!! Replace the SSA ensembles by one linear noise approximation solve per size
 
-    # Categorize species by size
-    monomers  = [s for s in species if len(s) == 1]
-    dimers    = [s for s in species if len(s) == 2]
-    trimers   = [s for s in species if len(s) == 3]
-    tetramers = [s for s in species if len(s) == 4]
-
-    groups = {
-        "Monomers": monomers,
-        "Dimers": dimers,
-        "Trimers": trimers,
-        "Tetramers": tetramers
-    }
+    # Mass of each species in each size group
+    weights, groups = size_weight_matrix(species)
+    monomers = [s for s in species if len(s) == 1]
 
     # Storage
     group_fractions = {g: [] for g in groups}
     group_std       = {g: [] for g in groups}
+    network = CompiledNetwork(reactions, reactant_lists, stoich_changes, rates)
+    rng = np.random.default_rng(seed)
 
     for N_total_system in system_sizes:
         print(f"\nSystem size {N_total_system}:")
@@ -39,8 +43,25 @@ if __name__ == "__main__":
         for s in monomers:
             initial_counts[idx[s]] = count_per_monomer
 
-        # Run simulations
-        all_trajectories = {s: [] for s in species}
+        if use_lna:
+            # Mean and SD of the group masses from one deterministic solve. The SD is
+            # that of a single run, so it is divided by sqrt(num_runs) to give the
+            # standard error of a num_runs mean, as in the SSA branch
+            moments = solve_moments(initial_counts, t_eval, network)
+            if moments["breakdown"][-1].any():
+                print("Warning: LNA not reliable for", [s for s, b in zip(species, moments["breakdown"][-1]) if b])
+            mass_mean, mass_sd = group_stats(moments, weights)
+            total_mass = initial_counts @ np.array([len(s) for s in species])
+            for j, gname in enumerate(groups):
+                group_fractions[gname].append(mass_mean[-1, j] / total_mass)
+                group_std[gname].append(mass_sd[-1, j] / total_mass / np.sqrt(num_runs))
+            print("Group fractions:")
+            for gname in groups:
+                print(f"{gname}: {group_fractions[gname][-1]:.4f} ± {group_std[gname][-1]:.4f}")
+            continue
+
+        # Run simulations; only the final state of each run is needed
+        final_states = []
         for r in range(num_runs):
             times, history = gillespie_ssa(
                 initial_counts,
@@ -48,42 +69,16 @@ if __name__ == "__main__":
                 reactions,
                 reactant_lists,
                 stoich_changes,
-                rates
+                rates,
+                rng=rng
             )
-            for s in species:
-                y = np.interp(t_eval, times, history[s])
-                all_trajectories[s].append(y)
-
-        # Convert to arrays
-        for s in species:
-            all_trajectories[s] = np.array(all_trajectories[s])
-
-        # Final snapshot
-        idx_final = -1
-        mean_state   = {s: np.mean(all_trajectories[s][:, idx_final]) for s in species}
-        std_state    = {s: np.std(all_trajectories[s][:, idx_final], ddof=1) for s in species}
-        stderr_state = {s: std_state[s] / np.sqrt(num_runs) for s in species}
-
-        # Total particles
-        N_total_final = sum(mean_state[s] * len(s) for s in species)
-
-        # Species fractions
-        proportions_mean = {}
-        proportions_std  = {}
-        for s in species:
-            weight = len(s)
-            p_mean = (mean_state[s] * weight) / N_total_final
-            p_std  = (stderr_state[s] * weight) / N_total_final if mean_state[s] > 0 else 0.0
-            proportions_mean[s] = p_mean
-            proportions_std[s]  = p_std
-
-        # ---- Sum by group ----
-        for gname, subspecies in groups.items():
-            group_frac = sum(proportions_mean[s] for s in subspecies)
-            group_sigma = np.sqrt(sum(proportions_std[s]**2 for s in subspecies))
+            final_states.append(Trajectory.from_history(times, history, species).state_at(t_eval[-1]))
 
-            group_fractions[gname].append(group_frac)
-            group_std[gname].append(group_sigma)
+        # Per-run group fractions of the final snapshot, shape (num_runs, species, 1)
+        fractions = mass_fractions(np.array(final_states)[:, :, None], species, weights)
+        for j, gname in enumerate(groups):
+            group_fractions[gname].append(fractions["group_mean"][j, 0])
+            group_std[gname].append(fractions["group_stderr"][j, 0])
 
         # Print results
         print("Group fractions:")
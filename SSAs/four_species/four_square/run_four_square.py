@@ -1,8 +1,17 @@
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 from four_square import (gillespie_ssa, species, idx,
  reactions, reactant_lists, stoich_changes, rates)
 
+# Shared analysis tools live in the refactored folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "refactored_four_square"))
+from trajectory import GridRecorder
+from network import CompiledNetwork
+from first_passage import FirstPassageRecorder
+from analysis import size_weight_matrix, mass_fractions, stacked_bottoms, EnsembleHistogram
+
 """
 Run the four-square simulation to allow easier plotting and analysis across multiple runs.
 """
@@ -10,8 +19,10 @@ Run the four-square simulation to allow easier plotting and analysis across mult
 if __name__ == "__main__":
     # Simulation parameters
     num_runs = 100         # number of independent simulations
+    seed = 12345           # seed for reproducible runs
     duration = 5           # simulation time
     t_eval = np.linspace(0, duration, 1000)  # time grid for aligned statistics
+    snapshot_times = [0, 0.1, 0.3, 1, duration]
 
     # Initial conditions
     initial_counts = np.zeros(len(species), dtype=int)
@@ -20,47 +31,52 @@ if __name__ == "__main__":
     initial_counts[idx["C"]] = 100
     initial_counts[idx["D"]] = 100
 
-    # Storage for all runs
-    all_trajectories = {s: [] for s in species}
+    # Distributions of every species and size group on the time grid, filled run by run
+    ensemble = EnsembleHistogram(t_eval, species, max_count=initial_counts.max())
+    all_snapshots = []  # state of each run at the snapshot times
 
-    # Times at which simulation ended
-    end_times = []
+    # First-passage times of each run (nan if not reached before the end of the run)
+    network = CompiledNetwork(reactions, reactant_lists, stoich_changes, rates)
+    passages = {
+        "first ABCD": "ABCD >= 1",
+        "monomers exhausted": "A + B + C + D == 0",
+        "stuck (a0 = 0)": "a0 == 0",
+    }
+    first_passage = {name: [] for name in passages}
 
     # Run simulations
     print(f"Running {num_runs} SSA simulations...")
+    rng = np.random.default_rng(seed)
 
+    n_absorbed = 0
     for r in range(num_runs):
-        times, history = gillespie_ssa(
+        # State in force at each grid/snapshot time, recorded during the run. A run that
+        # gets stuck (a0 = 0) keeps its absorbing state up to the end of the window.
+        recorder = FirstPassageRecorder(passages, species, network)
+        on_grid = GridRecorder(t_eval, len(species))
+        on_snapshots = GridRecorder(snapshot_times, len(species))
+        gillespie_ssa(
             initial_counts,
             duration,
             reactions,
             reactant_lists,
             stoich_changes,
-            rates
+            rates,
+            rng=rng,
+            observers=[recorder, on_grid, on_snapshots],
+            record_history=False
         )
+        for name in passages:
+            first_passage[name].append(recorder.times[name])
+        n_absorbed += on_grid.absorbed
 
-        # Record when simulation ended
-        end_times.append(times[-1])
-
-        # Interpolate onto fixed time grid, i.e. make all x points the same across runs
-        for s in species:
-            y = np.interp(t_eval, times, history[s]) # !!! This will extrapolate after simulation ends; creating a flat line
-            all_trajectories[s].append(y)
+        ensemble.add(on_grid.values)
+        all_snapshots.append(on_snapshots.values)
 
-    # Convert lists to arrays
-    for s in species:
-        all_trajectories[s] = np.array(all_trajectories[s])  # shape (num_runs, len(t_eval))
-
-    # Compute mean and SD; create array of means at each time, and array of SDs at each time
-    stats = {}
-    for s in species:
-        mean = np.mean(all_trajectories[s], axis=0)
-        std  = np.std(all_trajectories[s], axis=0)
-        stats[s] = (mean, std)
+    print(f"{n_absorbed}/{num_runs} runs reached an absorbing state before t = {duration}")
 
-    # Truncate the end times to the shortest simulation duration to avoid extrapolated data
-    t_final = min(end_times)
-    valid_indices = t_eval <= t_final
+    # Mean and SD at each time, from the distributions
+    stats = {s: (ensemble.mean(s), ensemble.std(s)) for s in species}
 
     ## PLOT MEAN +- SD ##
     print("Plotting ensemble statistics...")
@@ -69,8 +85,8 @@ if __name__ == "__main__":
         mean, std = stats[s]
 
         plt.figure(figsize=(6,4))
-        plt.errorbar(t_eval[valid_indices], mean[valid_indices], yerr = std[valid_indices], fmt = 'none', ecolor = "red", capsize = 1, label=f"SD")
-        plt.plot(t_eval[valid_indices], mean[valid_indices], label=f"Mean", color="blue", linewidth=2)
+        plt.errorbar(t_eval, mean, yerr = std, fmt = 'none', ecolor = "red", capsize = 1, label=f"SD")
+        plt.plot(t_eval, mean, label=f"Mean", color="blue", linewidth=2)
         plt.xlabel("Time")
         plt.ylabel("Count")
         plt.title(f"{s} — {num_runs} runs")
@@ -79,112 +95,74 @@ if __name__ == "__main__":
         plt.savefig(f"ensemble_{s}_forward.png", dpi=200)
         plt.close()
 
-    ## HISTOGRAM SHOWING SIMULATION DURATION ##
+    ## FIRST-PASSAGE TIMES (including the time runs got stuck) ##
     plt.figure(figsize=(6,4))
-    plt.hist(end_times, bins=20, color='skyblue', edgecolor='black')
-    plt.xlabel("Simulation end time")
+    for name, fpt in first_passage.items():
+        fpt = np.array(fpt)
+        reached = fpt[~np.isnan(fpt)]
+        print(f"{name}: reached in {len(reached)}/{num_runs} runs" + (f", median t = {np.median(reached):.4g}" if len(reached) else ""))
+        if len(reached):
+            plt.hist(reached, bins=20, alpha=0.6, label=name)
+    plt.xlabel("First-passage time")
     plt.ylabel("Number of runs")
-    plt.title("Simulation durations")
+    plt.title("First-passage times")
+    plt.legend()
     plt.tight_layout()
-    plt.savefig("simulation_end_times_hist.png", dpi=200)
+    plt.savefig("first_passage_times_hist.png", dpi=200)
     plt.close()
 
-    ## VISUALIZATION OF SPECIES PROPORTIONS ##
-
-    #snapshot_times = np.linspace(0, duration, 3)
-    snapshot_times = [0, 0.1, 0.3, 1, duration]
-
-    # Categorize species by size
-    monomers = [s for s in species if len(s) == 1]
-    dimers   = [s for s in species if len(s) == 2]
-    trimers  = [s for s in species if len(s) == 3]
-    tetramers= [s for s in species if len(s) == 4]
-
-    groups = {
-        "Monomers": monomers,
-        "Dimers": dimers,
-        "Trimers": trimers,
-        "Tetramers": tetramers,
-    }
+    ## ABCD YIELD DISTRIBUTION AT THE END ##
+    yield_values = ensemble.values("ABCD") / initial_counts.max() # fraction of the possible tetramers
+    yield_dist = ensemble.distribution("ABCD")[-1]
+    q10, q50, q90 = ensemble.quantiles("ABCD", [0.1, 0.5, 0.9])[:, -1] / initial_counts.max()
+    print(f"ABCD yield at t = {duration}: median {q50:.3f} (10%: {q10:.3f}, 90%: {q90:.3f})")
 
-    # Helper to get snapshot index
-    def nearest_index(array, value):
-        return np.argmin(np.abs(array - value)) # Index where this is minimized
-        
+    plt.figure(figsize=(6,4))
+    plt.bar(yield_values, yield_dist, width=1 / initial_counts.max(), color='skyblue', edgecolor='black')
+    plt.xlabel("ABCD yield")
+    plt.ylabel("Fraction of runs")
+    plt.title(f"ABCD yield at t = {duration} ({num_runs} runs)")
+    plt.tight_layout()
+    plt.savefig("ABCD_yield_distribution.png", dpi=200)
+    plt.close()
 
-    # Colors
-    cmap = plt.get_cmap("tab20")
-    color_map = {s: cmap(i % 20) for i, s in enumerate(species)}
+    ## VISUALIZATION OF SPECIES PROPORTIONS ##
 
+    # Per-run mass fractions of each species and size group at every snapshot
     print("Generating ensemble composition snapshots with species and group SDs...")
 
-    # TODO CHECK ALL THIS
-    for t_snap in snapshot_times:
-        idx_snap = np.argmin(np.abs(t_eval - t_snap))
-
-        # Compute mean & SD for each species
-        mean_state = {s: np.mean(all_trajectories[s][:, idx_snap]) for s in species}
-        std_state  = {s: np.std(all_trajectories[s][:, idx_snap]) for s in species}
-        stderr_state = {s: std_state[s] / np.sqrt(num_runs) for s in species} # Add 1/sqrt(N) for correct error bars
-
-        # Proportions for each species; careful not to divide by zero
-        N_total = sum(mean_state[s] * len(s) for s in species) # Total number of particles
-        proportions_mean = {}
-        proportions_std  = {}
+    all_snapshots = np.array(all_snapshots)  # shape (num_runs, len(snapshot_times), n_species)
+    weights, group_names = size_weight_matrix(species)
+    fractions = mass_fractions(all_snapshots.transpose(0, 2, 1), species, weights)
+    bottoms = stacked_bottoms(fractions["species_mean"], weights)
+    bar_groups = [group_names[g] for g in np.argmax(weights, axis=1)]
 
-        for s in species:
-            # Mean proportion
-            p_mean = (mean_state[s] * len(s)) / N_total
-
-
-            # If mean count is zero, the proportion is exactly zero with no uncertainty
-            if mean_state[s] == 0:
-                p_std = 0.0
-
-            else:
-                # Compute relative variance only when safe
-                p_std = (stderr_state[s] * len(s)) / N_total
+    # Colors
+    cmap = plt.get_cmap("tab20")
+    colors = [cmap(i % 20) for i in range(len(species))]
 
-            proportions_mean[s] = p_mean
-            proportions_std[s]  = p_std
+    for j_snap, t_snap in enumerate(snapshot_times):
+        p_mean = fractions["species_mean"][:, j_snap]
+        p_err = fractions["species_stderr"][:, j_snap]
 
-        # Prepare stacked barplot
+        # Stacked barplot: one call for all species, with species-level error bars (black)
         fig, ax = plt.subplots(figsize=(8,5))
-        bottom = np.zeros(len(groups))
-
-        for j, (gname, subspecies) in enumerate(groups.items()):
-            # Compute group-level proportions across all runs for SD
-            group_std  = np.sqrt(sum(proportions_std[s]**2 for s in subspecies))
-
-            # Plot each species slice
-            for s in subspecies:
-                frac = proportions_mean[s]
-                frac_std = proportions_std[s]
-
-                ax.bar(gname, frac, bottom=bottom[j], color=color_map[s], label=s)
+        bars = ax.bar(bar_groups, p_mean, bottom=bottoms[:, j_snap], color=colors)
+        ax.errorbar(bar_groups, bottoms[:, j_snap] + p_mean/2, yerr=p_err,
+                    fmt='none', ecolor='black', capsize=2, elinewidth=1)
 
-                # Species-level SD
-                ax.errorbar(gname, bottom[j]+frac/2, yerr=frac_std,
-                            fmt='none', ecolor='black', capsize=2, elinewidth=1)
-
-                bottom[j] += frac
-
-            # Group-level SD (red)
-            group_top = sum(proportions_mean[s] for s in subspecies) # Identifies where the SD bar will go
-            ax.errorbar(gname, group_top, yerr=group_std, fmt='none', ecolor='red', lw=2, capsize=4)
+        # Group-level error bars (red) at the top of each group
+        ax.errorbar(group_names, fractions["group_mean"][:, j_snap], yerr=fractions["group_stderr"][:, j_snap],
+                    fmt='none', ecolor='red', lw=2, capsize=4)
 
         ax.set_ylabel("Proportion of total molecules")
         ax.set_title(f"Ensemble Proportions at t = {t_snap:.2f} ({num_runs} runs)")
-
-        # Deduplicate legend
-        handles, labels = ax.get_legend_handles_labels()
-        unique = dict(zip(labels, handles))
-        ax.legend(unique.values(), unique.keys(), bbox_to_anchor=(1.05,1), loc="upper left")
+        ax.legend(bars, species, bbox_to_anchor=(1.05,1), loc="upper left")
 
         plt.tight_layout()
         plt.savefig(f"ensemble_snapshot_t{t_snap}_SD.png", dpi=200)
         plt.close()
 
-        print(f" Proportion for ABCD: {proportions_mean["ABCD"]} +- {proportions_std["ABCD"]}") # !!! Get proportion of a species
+        print(f" Proportion for ABCD: {p_mean[idx['ABCD']]} +- {p_err[idx['ABCD']]}") # !!! Get proportion of a species
 
     print("Ensemble snapshots with species & group SD complete.")
@@ -0,0 +1,194 @@
+import numpy as np
+
+"""
+Ensemble analysis of species counts.
+
+The ensemble is an array (runs, species, times) of counts, e.g. trajectories
+resampled on a common time grid or states at snapshot times. Mass fractions are
+computed per run (mass of a species or size group over the total mass of that run)
+and then averaged, so the error bars are the spread of the per-run fractions and
+not propagated from the mean counts.
+"""
+
+GROUP_NAMES = {1: "Monomers", 2: "Dimers", 3: "Trimers", 4: "Tetramers"}
+
+def size_weight_matrix(species):
+    """
+    Mass of each species in each size group.
+
+    :param species: list of species names (a species has one monomer per letter)
+    :return: weights (n_species, n_groups), list of group names
+    """
+    sizes = np.array([len(s) for s in species])
+    group_sizes = np.unique(sizes)
+    weights = np.where(sizes[:, None] == group_sizes[None, :], sizes[:, None], 0)
+    return weights, [GROUP_NAMES.get(n, f"{n}-mers") for n in group_sizes]
+
+def _mean_stderr(total, sq, n):
+    """Mean and standard error from the sum and the sum of squares of n samples."""
+    mean = total / n
+    if n < 2:
+        return mean, np.zeros_like(mean)
+    var = np.maximum(sq - n * mean**2, 0.0) / (n - 1)
+    return mean, np.sqrt(var / n)
+
+def mass_fractions(ensemble, species, weights=None, block_size=32):
+    """
+    Mass fractions of every species and size group in every run at every time.
+
+    Runs are processed in blocks small enough to stay in cache: each block is read
+    once, its group masses and total mass are one matrix product, and the species
+    fractions only enter the running sums, so no array of species fractions is made.
+
+    :param ensemble: counts, array (runs, species, times)
+    :param species: list of species names
+    :param weights: (n_species, n_groups) matrix, default size_weight_matrix(species)
+    :param block_size: number of runs per block
+    :return: dict with
+             "groups": per-run group fractions (runs, groups, times),
+             "group_mean", "group_stderr": (groups, times),
+             "species_mean", "species_stderr": (species, times)
+    """
+    ensemble = np.asarray(ensemble)
+    if weights is None:
+        weights, _ = size_weight_matrix(species)
+    sizes = weights.sum(axis=1)
+    n_runs, n_species, n_times = ensemble.shape
+    n_groups = weights.shape[1]
+
+    # Rows: mass of every group, then the total mass
+    project = np.vstack([weights.T, sizes]).astype(float)
+    group_fractions = np.empty((n_runs, n_groups, n_times))
+    species_sum = np.zeros((n_species, n_times))
+    species_sq = np.zeros((n_species, n_times))
+    group_sum = np.zeros((n_groups, n_times))
+    group_sq = np.zeros((n_groups, n_times))
+
+    for r0 in range(0, n_runs, block_size):
+        counts = ensemble[r0:r0 + block_size].astype(float)
+        mass = np.matmul(project, counts)
+        total = mass[:, -1]
+        total[total == 0] = 1.0
+        inv_total = 1.0 / total
+
+        # Species fractions n * size / total; the sizes are applied to the sums
+        species_sum += np.einsum("rst,rt->st", counts, inv_total)
+        species_sq += np.einsum("rst,rst,rt->st", counts, counts, inv_total * inv_total)
+
+        groups = np.multiply(mass[:, :-1], inv_total[:, None, :], out=group_fractions[r0:r0 + block_size])
+        group_sum += groups.sum(axis=0)
+        group_sq += np.einsum("rgt,rgt->gt", groups, groups)
+
+    species_mean, species_stderr = _mean_stderr(species_sum * sizes[:, None],
+                                                species_sq * sizes[:, None]**2, n_runs)
+    group_mean, group_stderr = _mean_stderr(group_sum, group_sq, n_runs)
+    return {"groups": group_fractions,
+            "group_mean": group_mean, "group_stderr": group_stderr,
+            "species_mean": species_mean, "species_stderr": species_stderr}
+
+def stacked_bottoms(fractions, weights):
+    """
+    Bottom of each species' bar when the species of a group are stacked in order.
+
+    :param fractions: species fractions (species, ...)
+    :param weights: (n_species, n_groups) matrix from size_weight_matrix
+    :return: array like fractions
+    """
+    group_of = np.argmax(weights, axis=1)
+    n = len(group_of)
+    below = (group_of[:, None] == group_of[None, :]) & (np.arange(n)[:, None] > np.arange(n)[None, :])
+    return np.tensordot(below.astype(float), fractions, axes=1)
+
+class EnsembleHistogram:
+    """
+    Streaming histograms of the counts of every species and the mass of every size
+    group, at every time of a fixed grid. Runs are added one at a time, so the full
+    distributions (quantiles, yields, ...) are available without keeping the
+    trajectories.
+    """
+
+    def __init__(self, t_grid, species, max_count, bin_width=1, weights=None):
+        """
+        :param t_grid: output times
+        :param species: list of species names
+        :param max_count: largest count of a single species (larger counts go to the last bin)
+        :param bin_width: counts per bin
+        :param weights: (n_species, n_groups) matrix, default size_weight_matrix(species)
+        """
+        self.t = np.asarray(t_grid, dtype=float)
+        self.species = list(species)
+        if weights is None:
+            weights, group_names = size_weight_matrix(species)
+        else:
+            group_names = [f"group {g}" for g in range(weights.shape[1])]
+        self.weights = np.asarray(weights)
+        self.names = self.species + list(group_names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.bin_width = bin_width
+
+        # species counts, then group masses (a group holds at most max_count of each member)
+        max_values = np.concatenate([np.full(len(self.species), max_count), self.weights.sum(axis=0) * max_count])
+        self.n_bins = max_values // bin_width + 1
+        self.offsets = np.concatenate([[0], np.cumsum(self.n_bins * len(self.t))])
+        self._hist = np.zeros(self.offsets[-1], dtype=np.int64)
+        # exact sums of the values and their squares, so the moments do not depend on the bins
+        self._sum = np.zeros((len(self.names), len(self.t)))
+        self._sum_sq = np.zeros((len(self.names), len(self.t)))
+        self.n_runs = 0
+
+    def add(self, on_grid):
+        """
+        Add one run.
+
+        :param on_grid: counts on the time grid, array (len(t_grid), n_species),
+                        e.g. Trajectory.resample(t_grid)
+        """
+        on_grid = np.asarray(on_grid)
+        values = np.concatenate([on_grid, on_grid @ self.weights], axis=1).T  # (names, times)
+        bins = np.minimum(values // self.bin_width, self.n_bins[:, None] - 1)
+        flat = self.offsets[:-1, None] + np.arange(len(self.t))[None, :] * self.n_bins[:, None] + bins
+        self._hist[flat.ravel()] += 1  # every (name, time) appears once per run
+        self._sum += values
+        self._sum_sq += values.astype(float)**2
+        self.n_runs += 1
+
+    def histogram(self, name):
+        """
+        Number of runs in each bin.
+
+        :param name: species or group name
+        :return: array (len(t_grid), n_bins); bin b holds values b*bin_width .. (b+1)*bin_width - 1
+        """
+        i = self.index[name]
+        return self._hist[self.offsets[i]:self.offsets[i + 1]].reshape(len(self.t), self.n_bins[i])
+
+    def distribution(self, name):
+        """Histogram normalized to probabilities at each time."""
+        return self.histogram(name) / max(self.n_runs, 1)
+
+    def values(self, name):
+        """Lower edge of each bin."""
+        return np.arange(self.n_bins[self.index[name]]) * self.bin_width
+
+    def mean(self, name):
+        """Mean over the runs at each time (exact, not from the bins)."""
+        return self._sum[self.index[name]] / max(self.n_runs, 1)
+
+    def std(self, name):
+        """Standard deviation over the runs at each time (exact, not from the bins)."""
+        i = self.index[name]
+        n = max(self.n_runs, 1)
+        mean = self._sum[i] / n
+        return np.sqrt(np.maximum(self._sum_sq[i] / n - mean**2, 0.0))
+
+    def quantiles(self, name, q):
+        """
+        Quantiles at each time (lower bin edges).
+
+        :param q: quantile or list of quantiles in [0, 1]
+        :return: array (len(q), len(t_grid))
+        """
+        cdf = np.cumsum(self.histogram(name), axis=1)
+        q = np.atleast_1d(q)
+        below = cdf[None, :, :] < q[:, None, None] * self.n_runs
+        return below.sum(axis=2).clip(max=self.n_bins[self.index[name]] - 1) * self.bin_width
@@ -2,6 +2,7 @@
 DUMMY_L2 = 1.0                 # L^2 for diffusion-based rates
 SIM_DURATION = 3000000.0            # total simulation time
 MAX_STEPS = int(1e7)            # max SSA steps
+RNG_SEED = 12345                # seed for the SSA random streams (None for a fresh seed)
 
 # Initial counts of monomers
 INITIAL_COUNTS = {
@@ -23,4 +24,5 @@ BOND_ENERGY = {
 # Plotting options
 PLOT_DPI = 200
 COLORMAP = "tab20"
-SNAPSHOT_TIMES = [0, 0.1, 0.3, 1, SIM_DURATION]
\ No newline at end of file
+SNAPSHOT_TIMES = [0, 0.1, 0.3, 1, SIM_DURATION]
+PLOT_WORKERS = None             # plot worker processes (None for one per CPU)
\ No newline at end of file
@@ -0,0 +1,94 @@
+import numpy as np
+
+"""
+Min/max decimation of long trajectories for plotting.
+
+A trajectory with millions of events puts most of its points on the same screen
+pixel. MinMaxPyramid stores, for every level k, the min and max of each aligned block
+of 2^k consecutive events (about one extra copy of the data in total). The min and
+max over any range of events are then combined from at most two blocks per level,
+so a window of the trajectory reduces to two points per pixel in
+O(pixels * log(n_events)) operations, whatever its length, and no extreme is lost.
+"""
+
+class MinMaxPyramid:
+    def __init__(self, values):
+        """
+        :param values: 1D array with the value after each event
+        """
+        values = np.asarray(values)
+        self.n = len(values)
+        self.mins = [values]
+        self.maxs = [values]
+        while len(self.mins[-1]) > 1:
+            lo, hi = self.mins[-1], self.maxs[-1]
+            m = len(lo) // 2 * 2
+            # a trailing odd block is carried up unchanged
+            self.mins.append(np.concatenate([np.minimum(lo[0:m:2], lo[1:m:2]), lo[m:]]))
+            self.maxs.append(np.concatenate([np.maximum(hi[0:m:2], hi[1:m:2]), hi[m:]]))
+
+    def range_minmax(self, lo, hi):
+        """
+        Exact min and max over the events lo..hi (inclusive) for many ranges at once.
+
+        :param lo, hi: integer arrays of the same shape, lo <= hi
+        :return: min array, max array
+        """
+        lo = np.array(lo, dtype=np.int64)
+        hi = np.array(hi, dtype=np.int64) + 1  # exclusive
+        vmin = np.full(lo.shape, self.mins[0][lo])
+        vmax = np.full(lo.shape, self.maxs[0][lo])
+
+        # Bottom-up decomposition into aligned blocks, as in a segment tree
+        for mins, maxs in zip(self.mins, self.maxs):
+            active = lo < hi
+            if not np.any(active):
+                break
+            take = active & (lo % 2 == 1)
+            vmin[take] = np.minimum(vmin[take], mins[lo[take]])
+            vmax[take] = np.maximum(vmax[take], maxs[lo[take]])
+            lo[take] += 1
+            take = active & (lo < hi) & (hi % 2 == 1)
+            vmin[take] = np.minimum(vmin[take], mins[hi[take] - 1])
+            vmax[take] = np.maximum(vmax[take], maxs[hi[take] - 1])
+            hi[take] -= 1
+            # a trailing odd block of this level lives at index len // 2 one level up
+            lo //= 2
+            hi //= 2
+        return vmin, vmax
+
+def decimate(times, values, t0, t1, pixels, pyramid=None):
+    """
+    Points to draw a piecewise-constant trajectory on [t0, t1] at a given pixel width.
+
+    Windows with fewer than 2 * pixels events are returned as they are. Otherwise each
+    pixel gives two points, its min and its max, at the pixel's left edge. The result
+    is meant to be drawn with drawstyle="steps-post" in both cases.
+
+    :param times: event times (sorted)
+    :param values: value after each event
+    :param t0, t1: time window
+    :param pixels: width of the plot in pixels
+    :param pyramid: MinMaxPyramid of values (built here if not given)
+    :return: t array, y array
+    """
+    times = np.asarray(times)
+    values = np.asarray(values)
+    i0 = max(np.searchsorted(times, t0, side="right") - 1, 0)
+    i1 = max(np.searchsorted(times, t1, side="right") - 1, 0)
+
+    if i1 - i0 < 2 * pixels:
+        t = np.concatenate([[max(t0, times[i0])], times[i0 + 1:i1 + 1], [t1]])
+        y = np.concatenate([values[i0:i1 + 1], [values[i1]]])
+        return t, y
+
+    if pyramid is None:
+        pyramid = MinMaxPyramid(values)
+    edges = np.linspace(t0, t1, pixels + 1)
+    idx = np.maximum(np.searchsorted(times, edges, side="right") - 1, 0)
+    # the states in force during pixel j are idx[j]..idx[j + 1]
+    vmin, vmax = pyramid.range_minmax(idx[:-1], idx[1:])
+
+    t = np.concatenate([np.repeat(edges[:-1], 2), [t1]])
+    y = np.concatenate([np.column_stack([vmin, vmax]).ravel(), [values[idx[-1]]]])
+    return t, y
@@ -5,9 +5,10 @@ import matplotlib.pyplot as plt
 from species import species, idx
 from reactions import reactions, reactant_lists, stoich_changes
 from rates import rates
-from ssa import gillespie_ssa_with_log
+from ssa import gillespie_ssa
+from time_averages import TimeAverageAccumulator, history_to_array, time_weighted_stats
 from odes import odes
-from config import INITIAL_COUNTS, SIM_DURATION
+from config import INITIAL_COUNTS, SIM_DURATION, RNG_SEED
 from plot_utils import plot_species_trajectory, plot_species_snapshots
 
 # Reaction pairs rates
@@ -19,11 +20,27 @@ reversible_pairs = [
     ("k29","k30"), ("k31","k32"), ("k33","k34"), ("k35","k36")
 ]
 
-def compute_net_fluxes(history, reactions, rates, species, window=1000):
+def compute_net_fluxes(history, reactions, rates, species, window=1000, times=None, equil_counts=None):
     """
     Compute net flux k_fw <alpha> - k_bw <beta> using equilibrium averages.
+
+    If times is given, the averages over the last `window` events are weighted by
+    the holding time of each state. Otherwise every event counts the same, which
+    biases the averages towards states where reactions fire quickly.
+    equil_counts can be given instead as a dict of precomputed equilibrium counts
+    (e.g. from a TimeAverageAccumulator); history may then be None, and history,
+    window and times are ignored.
     """
-    equil_counts = {s: np.mean(history[s][-window:]) for s in species}
+    if equil_counts is None and history is None:
+        raise ValueError("Either history or equil_counts is needed")
+    if equil_counts is not None:
+        equil_counts = dict(equil_counts)
+    elif times is not None:
+        counts = history_to_array(history, species)
+        stats = time_weighted_stats(times, counts, t_start=times[-min(window, len(times))])
+        equil_counts = {s: stats["mean"][i] for i, s in enumerate(species)}
+    else:
+        equil_counts = {s: np.mean(history[s][-window:]) for s in species}
 
     net_fluxes = {}
 
@@ -75,18 +92,24 @@ def plot_net_flux_bars(flux_matrix, pair_labels, durations):
 initial_counts = np.zeros(len(species), dtype=int)
 for s, n in INITIAL_COUNTS.items():
     initial_counts[idx[s]] = n
-"""
+
 SIM_DURATIONS = [0.1, 1, 10, 100, 1000]
 flux_by_duration = {}
+rng = np.random.default_rng(RNG_SEED)
 
 for T in SIM_DURATIONS:
-    times, history, events = gillespie_ssa_with_log(
+    # Equilibrium averages over the second half of the run, streamed instead of stored
+    accumulator = TimeAverageAccumulator(len(species), T / 2, T)
+    gillespie_ssa(
         initial_counts, T, species,
-        reactions, reactant_lists, stoich_changes, rates
+        reactions, reactant_lists, stoich_changes, rates,
+        observers=[accumulator], record_history=False, rng=rng
     )
+    mean = accumulator.stats()["mean"]
 
     flux_by_duration[T] = compute_net_fluxes(
-        history, reactions, rates, species, window=500
+        None, reactions, rates, species,
+        equil_counts={s: mean[i] for i, s in enumerate(species)}
     )
 
 pair_labels = list(next(iter(flux_by_duration.values())).keys())
@@ -97,7 +120,7 @@ flux_matrix = np.array([
 ])
 
 plot_net_flux_bars(flux_matrix, pair_labels, SIM_DURATIONS)
-"""
+
 ### ODE CHECK ###
 
 # Solve ODEs
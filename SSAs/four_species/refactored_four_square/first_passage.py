@@ -0,0 +1,161 @@
+import re
+import operator
+import numpy as np
+from ssa_kernel import WATCH_OPS
+
+"""
+First-passage times recorded while the SSA runs.
+
+A FirstPassageRecorder is an observer (see ssa.gillespie_ssa) holding predicates
+over the counts, written as strings such as
+
+    "ABCD >= 1"              first tetramer
+    "A + B + C + D == 0"     monomers exhausted
+    "a0 == 0"                no reaction can fire any more (absorbing state)
+
+or as functions of the counts array. Each predicate is checked after every event
+until it first holds; the time is recorded and the predicate is not checked again.
+"a0 == 0" itself is not evaluated: it fires when the engine reports absorption.
+With stop_when_all=True the run stops once every predicate has fired, so a run can
+be used for its first-passage times alone, with record_history=False.
+
+Predicate strings without a0 are sums of counts compared with a number, so the
+compiled SSA kernel can watch them itself (kernel_watch) instead of handing every
+event back to Python: it returns at the first event where one holds, and the run
+stops at exactly the same event as in the Python loop.
+"""
+
+_OPERATORS = {">=": operator.ge, "<=": operator.le, "==": operator.eq,
+              "!=": operator.ne, ">": operator.gt, "<": operator.lt}
+_ABSORBED = re.compile(r"^\s*a0\s*==\s*0+(\.0*)?\s*$")
+_PREDICATE = re.compile(r"^\s*([\w\s+]+?)\s*(>=|<=|==|!=|>|<)\s*([-+]?[\d.]+(?:[eE][-+]?\d+)?)\s*$")
+
+def _split_predicate(text, species):
+    """Terms, operator string and value of "X + Y ... <op> value"."""
+    match = _PREDICATE.match(text)
+    if match is None:
+        raise ValueError(f"Cannot parse predicate: {text!r}")
+    terms = [term.strip() for term in match.group(1).split("+")]
+    unknown = [term for term in terms if term not in species and term != "a0"]
+    if unknown:
+        raise ValueError(f"Unknown species in predicate {text!r}: {unknown}")
+    return terms, match.group(2), float(match.group(3))
+
+def parse_predicate(text, species, network=None):
+    """
+    Turn "X + Y ... <op> value" into a function of the counts array.
+
+    :param text: predicate; terms are species names or a0 (total propensity)
+    :param species: list of species names
+    :param network: CompiledNetwork, needed only if the predicate uses a0
+    :return: function counts -> bool
+    """
+    terms, op, value = _split_predicate(text, species)
+    compare = _OPERATORS[op]
+    index = {s: i for i, s in enumerate(species)}
+    if "a0" in terms and network is None:
+        raise ValueError(f"Predicate {text!r} uses a0 and needs the network")
+
+    columns = [index[term] for term in terms if term != "a0"]
+    with_a0 = "a0" in terms
+
+    def predicate(counts):
+        total = sum(counts[i] for i in columns)
+        if with_a0:
+            total += network.propensities(counts).sum()
+        return compare(total, value)
+    return predicate
+
+def linear_predicate(text, species):
+    """
+    Linear form of "X + Y ... <op> value", for the compiled kernel.
+
+    :param text: predicate string
+    :param species: list of species names
+    :return: (coefficient of every species, operator string, value), or None if the
+             predicate uses a0
+    """
+    terms, op, value = _split_predicate(text, species)
+    if "a0" in terms:
+        return None
+    index = {s: i for i, s in enumerate(species)}
+    coeffs = np.zeros(len(species))
+    np.add.at(coeffs, [index[term] for term in terms], 1.0)
+    return coeffs, op, value
+
+class FirstPassageRecorder:
+    def __init__(self, predicates, species, network=None, stop_when_all=False):
+        """
+        :param predicates: dict name -> predicate string or function of the counts,
+                           or a list of predicate strings (used as their own names)
+        :param species: list of species names
+        :param network: CompiledNetwork, for predicates that use a0
+        :param stop_when_all: ask the engine to stop once every predicate has fired
+        """
+        if not isinstance(predicates, dict):
+            predicates = {text: text for text in predicates}
+        self.names = list(predicates)
+        # "a0 == 0" is reported by the engine (absorb), so it costs nothing per event
+        self._on_absorb = [i for i, p in enumerate(predicates.values()) if isinstance(p, str) and _ABSORBED.match(p)]
+        self._checks = [None if i in self._on_absorb else p if callable(p) else parse_predicate(p, species, network)
+                        for i, p in enumerate(predicates.values())]
+        self._linear = [linear_predicate(p, species) if isinstance(p, str) and i not in self._on_absorb else None
+                        for i, p in enumerate(predicates.values())]
+        self._n_species = len(species)
+        self.stop_when_all = stop_when_all
+        self.times = {name: np.nan for name in self.names}
+        self.states = {name: None for name in self.names}
+        self._pending = [i for i in range(len(self.names)) if i not in self._on_absorb]
+        self._pending_absorb = list(self._on_absorb)
+
+    @property
+    def done(self):
+        """True once every predicate has fired."""
+        return not self._pending and not self._pending_absorb
+
+    @property
+    def can_stop(self):
+        """True if update may ask the engine to stop."""
+        return self.stop_when_all
+
+    def kernel_watch(self):
+        """
+        Pending predicates in the form the compiled kernel watches (see ssa_kernel.run_kernel).
+
+        :return: (coefficients (m, n_species), comparison codes (m,), values (m,)), or
+                 None if a pending predicate is a function or uses a0
+        """
+        linear = [self._linear[i] for i in self._pending]
+        if any(form is None for form in linear):
+            return None
+        return (np.array([form[0] for form in linear]).reshape(-1, self._n_species),
+                np.array([WATCH_OPS[form[1]] for form in linear], dtype=np.int64),
+                np.array([form[2] for form in linear]))
+
+    def _fire(self, i, t, counts):
+        self.times[self.names[i]] = float(t)
+        self.states[self.names[i]] = np.array(counts)
+
+    def _check(self, t, counts):
+        fired = [i for i in self._pending if self._checks[i](counts)]
+        for i in fired:
+            self._fire(i, t, counts)
+            self._pending.remove(i)
+        return self.stop_when_all and self.done
+
+    def start(self, t, counts):
+        return self._check(t, counts)
+
+    def update(self, t, counts):
+        """Returns True when the engine should stop."""
+        return self._check(t, counts) if self._pending else self.stop_when_all and self.done
+
+    def absorb(self, t, counts):
+        for i in self._pending_absorb:
+            self._fire(i, t, counts)
+        self._pending_absorb = []
+        self._check(t, counts)
+
+    def finish(self, t, counts):
+        # every state was checked when it was entered
+        pass
@@ -0,0 +1,158 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import expm_multiply, spsolve
+
+"""
+Finite State Projection (FSP) solver for the chemical master equation.
+
+For small systems every state reachable from the initial counts can be listed, since
+the number of each monomer type is conserved. The master equation dp/dt = A p is then
+a finite linear system, and its solution gives the exact distribution of the counts
+with no sampling noise. This is a ground truth for checking the SSA engines.
+"""
+
+def enumerate_states(initial_counts, network, max_states=int(1e6)):
+    """
+    List every state reachable from initial_counts through reactions with nonzero propensity.
+
+    :param initial_counts: initial species counts
+    :param network: CompiledNetwork
+    :param max_states: stop with an error if the state space is larger than this
+    :return: array of states (n_states, n_species), first row is the initial state
+    """
+    start = tuple(int(n) for n in initial_counts)
+    index = {start: 0}
+    states = [start]
+    frontier = [start]
+
+    while frontier:
+        current = np.array(frontier)
+        a = network.propensities(current)
+        frontier = []
+        for i, ri in zip(*np.nonzero(a > 0)):
+            new_state = tuple(int(n) for n in current[i] + network.stoich[ri])
+            if new_state not in index:
+                index[new_state] = len(states)
+                states.append(new_state)
+                frontier.append(new_state)
+        if len(states) > max_states:
+            raise ValueError(f"More than {max_states} reachable states; use the SSA for this system size")
+
+    return np.array(states, dtype=np.int64)
+
+def build_generator(states, network):
+    """
+    Sparse CME generator A such that dp/dt = A p.
+
+    :param states: array of states from enumerate_states
+    :param network: CompiledNetwork
+    :return: sparse CSC matrix (n_states, n_states)
+    """
+    n_states = len(states)
+    index = {tuple(s): i for i, s in enumerate(states.tolist())}
+    a = network.propensities(states)
+
+    rows, cols, vals = [], [], []
+    for i, ri in zip(*np.nonzero(a > 0)):
+        j = index[tuple((states[i] + network.stoich[ri]).tolist())]
+        rows.append(j)
+        cols.append(i)
+        vals.append(a[i, ri])
+
+    # Outflow from each state on the diagonal
+    rows.extend(range(n_states))
+    cols.extend(range(n_states))
+    vals.extend(-a.sum(axis=1))
+
+    return sparse.csc_matrix((vals, (rows, cols)), shape=(n_states, n_states))
+
+def solve_fsp(A, t_eval, p0=None):
+    """
+    Propagate the distribution with Krylov exponential-vector products.
+
+    :param A: generator from build_generator
+    :param t_eval: increasing output times (starting from t = 0)
+    :param p0: initial distribution (default: all mass on the first state)
+    :return: array of shape (len(t_eval), n_states)
+    """
+    n_states = A.shape[0]
+    if p0 is None:
+        p0 = np.zeros(n_states)
+        p0[0] = 1.0
+
+    p = np.array(p0, dtype=float)
+    out = np.empty((len(t_eval), n_states))
+    t_prev = 0.0
+    for i, t in enumerate(t_eval):
+        if t > t_prev:
+            p = expm_multiply(A * (t - t_prev), p)
+            # Remove round-off so p stays a distribution
+            p = np.maximum(p, 0.0)
+            p /= p.sum()
+        out[i] = p
+        t_prev = t
+    return out
+
+def stationary_distribution(A):
+    """
+    Solve A p = 0 with sum(p) = 1.
+
+    Only unique when every state can reach every other one (e.g. detailed balance
+    rates). With absorbing states (koff = 0) use solve_fsp at a long time instead.
+
+    :param A: generator from build_generator
+    :return: stationary distribution over the states
+    """
+    # Fix p[0] = 1 and solve the remaining balance equations; this keeps the
+    # system sparse, unlike replacing a row by the normalization condition
+    A = sparse.csc_matrix(A)
+    p = np.ones(A.shape[0])
+    p[1:] = spsolve(A[1:, 1:], -A[1:, 0].toarray().ravel())
+    if not np.all(np.isfinite(p)):
+        raise ValueError("Stationary distribution is not unique (absorbing or disconnected states)")
+    p = np.maximum(p, 0.0)
+    return p / p.sum()
+
+def marginals(states, p, species):
+    """
+    Distribution of each species' count.
+
+    :param states: array of states from enumerate_states
+    :param p: distribution over the states
+    :param species: list of species names
+    :return: dict species -> array P(count = n) for n = 0..max
+    """
+    return {s: np.bincount(states[:, i], weights=p) for i, s in enumerate(species)}
+
+def moments(states, p):
+    """
+    Mean and variance of every species count.
+
+    :param states: array of states from enumerate_states
+    :param p: distribution over the states (or array of them, one per row)
+    :return: mean, variance
+    """
+    mean = p @ states
+    var = p @ states**2 - mean**2
+    return mean, var
+
+if __name__ == "__main__":
+    from species import species, idx
+    from reactions import reactions, reactant_lists, stoich_changes
+    from rates import rates
+    from network import CompiledNetwork
+
+    # Same small system as the four-square __main__: 5 copies of each monomer
+    initial_counts = np.zeros(len(species), dtype=int)
+    for s in ["A", "B", "C", "D"]:
+        initial_counts[idx[s]] = 5
+
+    network = CompiledNetwork(reactions, reactant_lists, stoich_changes, rates)
+    states = enumerate_states(initial_counts, network)
+    A = build_generator(states, network)
+    print(f"{len(states)} reachable states, {A.nnz} nonzeros in the generator")
+
+    p_eq = stationary_distribution(A)
+    mean, var = moments(states, p_eq)
+    for i, s in enumerate(species):
+        print(f"{s:>5}: mean = {mean[i]:.4f}, SD = {np.sqrt(var[i]):.4f}")
@@ -0,0 +1,172 @@
+import numpy as np
+import math
+from ssa import RandomStream, _absorb
+
+"""
+Hybrid SSA/ODE simulation for systems that mix high and low copy numbers.
+
+Reactions whose species all have large counts and that fire many times per step are
+"fast": they are integrated continuously as rate equations, or as a chemical Langevin
+equation if langevin=True. All other reactions are "slow" and fire exactly, as in the
+SSA: a slow reaction fires once the integral of the slow propensity reaches an
+exponential random number. The partition is re-evaluated at every step, so a reaction
+becomes stochastic again when one of its species runs low.
+
+Fast reactions are tracked through their extents (number of times they have fired,
+as a real number). When a reaction turns slow its extent is rounded to an integer,
+and every species that no remaining fast reaction changes is snapped to the nearest
+integer, which removes the floating-point residue of the continuous steps. Species
+outside the fast reactions are therefore exact integers, and the number of monomers
+is conserved exactly once all reactions are slow.
+Counts are never clipped: a continuous step that would take a count below zero (a
+Langevin kick, say) is rejected and retried with half the step size.
+
+Observers work as in ssa.gillespie_ssa, except that they see the real-valued counts
+after every step, and that update is called once per continuous step or slow event.
+"""
+
+def _stochastic_round(x, stream):
+    """Round to floor(x) or ceil(x) with probabilities that keep the mean."""
+    low = math.floor(x)
+    return low + (stream.uniform() < x - low)
+
+def hybrid_ssa(initial_counts, t_max, species, network, dt=0.01, threshold=100, min_events=10,
+               eps=0.01, langevin=False, max_steps=int(1e7), observers=(), record_history=True, rng=None):
+    """
+    Runs the hybrid simulation until t_max or max_steps.
+
+    :param initial_counts: initial species counts
+    :param t_max: simulation time
+    :param species: list of species names
+    :param network: CompiledNetwork
+    :param dt: largest continuous step
+    :param threshold: a reaction can only be fast if every species it changes has at least this count
+    :param min_events: ... and if it is expected to fire at least this many times per step
+    :param eps: largest relative change of a continuous species in one step
+    :param langevin: add chemical Langevin noise to the fast reactions
+    :param max_steps: maximum number of continuous steps
+    :param observers: as in ssa.gillespie_ssa (absorb is called once no reaction can fire)
+    :param record_history: if False, history only keeps the initial and final states
+    :param rng: numpy Generator or seed for the random numbers
+    Returns times array and history dict mapping species->list (one entry per step or slow event)
+    """
+    x = np.array(initial_counts, dtype=float)
+    stream = rng if isinstance(rng, RandomStream) else RandomStream(rng)
+    S = network.stoich.astype(float)
+    touched = network.stoich != 0
+    extent = np.zeros(network.n_reactions)  # unrounded extent of each reaction since it turned fast
+    fast = np.zeros(network.n_reactions, dtype=bool)
+
+    t = 0.0
+    xi = stream.exponential()  # slow reaction fires when the integral reaches xi
+    integral = 0.0
+
+    history = {s: [float(x[idx_s])] for idx_s, s in enumerate(species)}
+    times = [t]
+    for obs in observers:
+        obs.start(t, x)
+
+    for step in range(max_steps):
+        if t >= t_max:
+            break
+
+        a = network.propensities(x)
+
+        # Partition reactions; round the extent of any reaction that stops being fast
+        big = np.all((x[None, :] >= threshold) | ~touched, axis=1)
+        new_fast = big & (a * dt >= min_events)
+        rounded = fast & ~new_fast
+        for ri in np.nonzero(rounded)[0]:
+            x += (_stochastic_round(extent[ri], stream) - extent[ri]) * S[ri]
+            extent[ri] = 0.0
+        fast = new_fast
+        if np.any(rounded):
+            settled = ~np.any(touched[fast], axis=0)
+            x[settled] = np.rint(x[settled])
+            # the counts changed, so the propensities did too
+            a = network.propensities(x)
+        if not np.any(a > 0.0):
+            # no more reactions possible: the state holds until t_max
+            _absorb(observers, t, x)
+            t = t_max
+            break
+
+        a_fast = np.where(fast, a, 0.0)
+        a_slow = np.where(fast, 0.0, a)
+        a0_slow = a_slow.sum()
+
+        # Step size: limited by dt, by the relative change of fast species, and by t_max
+        h = min(dt, t_max - t)
+        drift = a_fast @ S
+        moving = drift != 0
+        if np.any(moving):
+            h = min(h, eps * np.min(np.maximum(x[moving], 1.0) / np.abs(drift[moving])))
+
+        # Does a slow reaction fire within this step?
+        fire = a0_slow > 0 and integral + a0_slow * h >= xi
+        if fire:
+            h = (xi - integral) / a0_slow
+
+        # Continuous update of the fast reactions; a step that would make a count
+        # negative is rejected and halved (the slow reaction then no longer fires in it)
+        while True:
+            dz = a_fast * h
+            if langevin:
+                dz = dz + np.sqrt(a_fast * h) * stream.normal(network.n_reactions)
+            x_new = x + dz @ S
+            if np.all(x_new >= 0.0):
+                break
+            h /= 2
+            fire = False
+        x = x_new
+        extent += dz
+        t += h
+        integral += a0_slow * h
+
+        if fire:
+            cum = np.cumsum(a_slow)
+            ri = min(np.searchsorted(cum, stream.uniform() * a0_slow), network.n_reactions - 1)
+            x += S[ri]
+            integral = 0.0
+            xi = stream.exponential()
+
+        stop = False
+        for obs in observers:
+            stop |= bool(obs.update(t, x))
+
+        if record_history:
+            times.append(t)
+            for idx_s, s in enumerate(species):
+                history[s].append(float(x[idx_s]))
+
+        if stop:
+            break
+
+    for obs in observers:
+        obs.finish(t, x)
+
+    # close the trajectory with the final state
+    if times[-1] != t or len(times) == 1:
+        times.append(t)
+        for idx_s, s in enumerate(species):
+            history[s].append(float(x[idx_s]))
+
+    return np.array(times), history
+
+if __name__ == "__main__":
+    from species import species, idx
+    from reactions import reactions, reactant_lists, stoich_changes
+    from rates import rates
+    from network import CompiledNetwork
+
+    # Many A and B (fast A-B binding), few C and D (stochastic ABCD formation)
+    initial_counts = np.zeros(len(species), dtype=int)
+    initial_counts[idx["A"]] = 5000
+    initial_counts[idx["B"]] = 5000
+    initial_counts[idx["C"]] = 10
+    initial_counts[idx["D"]] = 25
+
+    network = CompiledNetwork(reactions, reactant_lists, stoich_changes, rates)
+    times, history = hybrid_ssa(initial_counts, 10.0, species, network, rng=1)
+    print(f"{len(times)} steps")
+    print("Final counts:", {s: round(float(history[s][-1]), 2) for s in species})
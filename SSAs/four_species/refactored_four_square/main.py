@@ -1,33 +1,36 @@
 import numpy as np
 from collections import defaultdict
 from scipy.integrate import solve_ivp
-import matplotlib.pyplot as plt
 from species import species, idx
 from reactions import reactions, reactant_lists, stoich_changes
 from rates import rates
 from ssa import gillespie_ssa_with_log
 from odes import odes
-from config import INITIAL_COUNTS, SIM_DURATION
-from plot_utils import plot_species_trajectory, plot_species_snapshots
+from config import INITIAL_COUNTS, SIM_DURATION, RNG_SEED
+from plot_utils import plot_species_trajectory, plot_species_snapshots, plot_pool
 
-# Initial counts array
-initial_counts = np.zeros(len(species), dtype=int)
-for s, n in INITIAL_COUNTS.items():
-    initial_counts[idx[s]] = n
+if __name__ == "__main__":  # plot workers re-import this module on spawn platforms
+    # Initial counts array
+    initial_counts = np.zeros(len(species), dtype=int)
+    for s, n in INITIAL_COUNTS.items():
+        initial_counts[idx[s]] = n
 
-# Run SSA
-times, history, events = gillespie_ssa_with_log(
-    initial_counts, SIM_DURATION, species,
-    reactions, reactant_lists, stoich_changes, rates
-)
+    # Run SSA
+    times, history, events = gillespie_ssa_with_log(
+        initial_counts, SIM_DURATION, species,
+        reactions, reactant_lists, stoich_changes, rates,
+        rng=RNG_SEED
+    )
 
-# Solve ODEs
-y0 = initial_counts.astype(float)
-t_span = (0, SIM_DURATION)
-t_eval = np.linspace(*t_span, 1000)
-sol = solve_ivp(odes, t_span, y0, t_eval=t_eval, method='LSODA')
-
-# Plot
-plot_species_trajectory(times, history, species, sol)
-plot_species_snapshots(times, history, species)
+    # Solve ODEs
+    y0 = initial_counts.astype(float)
+    t_span = (0, SIM_DURATION)
+    t_eval = np.linspace(*t_span, 1000)
+    sol = solve_ivp(odes, t_span, y0, t_eval=t_eval, method='LSODA')
 
+    # Plot in worker processes; leaving the block waits for the figures
+    with plot_pool() as pool:
+        futures = plot_species_trajectory(times, history, species, sol, pool=pool)
+        futures.append(plot_species_snapshots(times, history, species, pool=pool))
+        for future in futures:
+            future.result()
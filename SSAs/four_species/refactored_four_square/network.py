@@ -0,0 +1,63 @@
+import numpy as np
+
+class CompiledNetwork:
+    """
+    Array form of a reaction network, shared by the engines that work on whole
+    state vectors at once (FSP, moment equations, compiled kernels) instead of
+    looping over reactant_lists.
+
+    Attributes:
+    k: rate constant of each reaction
+    reactants: (n_reactions, max_order) species indices, padded with -1
+    stoich: (n_reactions, n_species) stoichiometric changes
+    """
+
+    def __init__(self, reactions, reactant_lists, stoich_changes, rates):
+        """
+        :param reactions: list of reaction dicts (to get the k key)
+        :param reactant_lists: list of lists of (species_index, stoich)
+        :param stoich_changes: matrix of stoichiometric changes
+        :param rates: dict of k's
+        """
+        self.k = np.array([rates[r["k"]] for r in reactions], dtype=float)
+        self.stoich = np.asarray(stoich_changes, dtype=np.int64)
+        self.n_reactions, self.n_species = self.stoich.shape
+
+        order = max(1, max(len(rlist) for rlist in reactant_lists))
+        self.reactants = np.full((self.n_reactions, order), -1, dtype=np.int64)
+        for ri, rlist in enumerate(reactant_lists):
+            for j, (s_idx, cnt) in enumerate(rlist):
+                if cnt != 1:
+                    raise ValueError("Only reactant stoichiometry 1 is supported")
+                self.reactants[ri, j] = s_idx
+
+    def propensities(self, counts):
+        """
+        Mass-action propensities k * n1 * n2, as in ssa.compute_propensities.
+
+        :param counts: state vector, or array of states with species on the last axis
+        :return: array of propensities with reactions on the last axis
+        """
+        counts = np.asarray(counts, dtype=float)
+        # Padding index -1 picks up the appended column of ones
+        padded = np.concatenate([counts, np.ones(counts.shape[:-1] + (1,))], axis=-1)
+        return self.k * np.prod(padded[..., self.reactants], axis=-1)
+
+
+    def propensity_jacobian(self, x):
+        """
+        Derivatives of the mass-action propensities with respect to the state.
+
+        :param x: state vector (may be continuous)
+        :return: array of shape (n_reactions, n_species)
+        """
+        padded = np.append(np.asarray(x, dtype=float), 1.0)
+        jac = np.zeros((self.n_reactions, self.n_species))
+        rows = np.arange(self.n_reactions)
+        for j in range(self.reactants.shape[1]):
+            # Product of the other reactants (padding contributes 1)
+            others = np.delete(self.reactants, j, axis=1)
+            partial = self.k * np.prod(padded[others], axis=1)
+            has = self.reactants[:, j] >= 0
+            np.add.at(jac, (rows[has], self.reactants[has, j]), partial[has])
+        return jac
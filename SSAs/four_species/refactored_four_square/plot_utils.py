@@ -1,65 +1,150 @@
-import matplotlib.pyplot as plt
+import os
+import sys
 import numpy as np
-from config import PLOT_DPI, SNAPSHOT_TIMES, COLORMAP
-
-def plot_species_trajectory(times, history, species, sol=None, filename_prefix="species_trajectory"):
-    for i, s in enumerate(species):
-        plt.figure(figsize=(6,3))
-        plt.plot(times, history[s], label=f"{s} (SSA)")
-        if sol is not None:
-            plt.plot(sol.t, sol.y[i], '--', label=f"{s} (ODE)")
-        plt.xlabel("Time")
-        plt.ylabel("Count")
-        plt.title(f"{s}")
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig(f"{filename_prefix}_{s}.png", dpi=PLOT_DPI)
-        plt.close()
-
-def plot_species_snapshots(times, history, species, snapshot_times=None):
-    if snapshot_times is None:
-        snapshot_times = SNAPSHOT_TIMES
+from concurrent.futures import ProcessPoolExecutor
+from config import PLOT_DPI, SNAPSHOT_TIMES, COLORMAP, PLOT_WORKERS
+from trajectory import Trajectory
+from analysis import size_weight_matrix, mass_fractions, stacked_bottoms
 
-    monomers = [s for s in species if len(s) == 1]
-    dimers   = [s for s in species if len(s) == 2]
-    trimers  = [s for s in species if len(s) == 3]
-    tetramers= [s for s in species if len(s) == 4]
+"""
+Plotting helpers.
 
-    groups = {
-        "Monomers": monomers,
-        "Dimers": dimers,
-        "Trimers": trimers,
-        "Tetramers": tetramers,
-    }
+Matplotlib is only imported when something is drawn (and then on the Agg backend),
+so importing this module costs nothing for runs that never plot. Each function
+draws one figure and updates its artists for every species/snapshot instead of
+building a new figure each time.
 
-    cmap = plt.get_cmap(COLORMAP)
-    color_map = {s: cmap(i % 20) for i, s in enumerate(species)}
+Long trajectories are decimated to their min/max per pixel (see decimate.py)
+before they reach Matplotlib.
+
+Passing pool=plot_pool() renders in worker processes: the functions then return
+futures right away and the simulation does not wait for the PNGs to be written.
+"""
+
+TRAJECTORY_FIGSIZE = (6, 3)
+
+_plt = None
+
+def _pyplot():
+    """Import pyplot on first use, on the non-interactive Agg backend."""
+    global _plt
+    if _plt is None:
+        import matplotlib
+        if "matplotlib.pyplot" not in sys.modules:
+            matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        _plt = plt
+    return _plt
+
+def plot_pool(workers=PLOT_WORKERS):
+    """
+    Worker pool for rendering figures outside the simulation process.
+
+    :param workers: number of worker processes (None for one per CPU)
+    :return: ProcessPoolExecutor, to be used as a context manager
+    """
+    return ProcessPoolExecutor(max_workers=workers)
+
+def _chunks(items, n):
+    """Split items into at most n contiguous chunks of similar size."""
+    n = max(1, min(n, len(items)))
+    bounds = np.linspace(0, len(items), n + 1).astype(int)
+    return [items[b0:b1] for b0, b1 in zip(bounds[:-1], bounds[1:])]
+
+def _render_trajectories(lines, names, ode_t=None, ode_y=None, filename_prefix="species_trajectory"):
+    """Draw one species after the other on the same figure, updating the line data."""
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=TRAJECTORY_FIGSIZE)
+    ssa_line, = ax.plot([], [], drawstyle="steps-post")
+    ode_line = ax.plot([], [], '--')[0] if ode_y is not None else None
+    ax.set_xlabel("Time")
+    ax.set_ylabel("Count")
 
-    def nearest_index(array, value):
-        return np.argmin(np.abs(array - value))
+    for i, s in enumerate(names):
+        ssa_line.set_data(*lines[i])
+        ssa_line.set_label(f"{s} (SSA)")
+        if ode_line is not None:
+            ode_line.set_data(ode_t, ode_y[i])
+            ode_line.set_label(f"{s} (ODE)")
+        ax.relim()
+        ax.autoscale_view()
+        ax.set_title(f"{s}")
+        ax.legend()
+        fig.tight_layout()
+        fig.savefig(f"{filename_prefix}_{s}.png", dpi=PLOT_DPI)
+    plt.close(fig)
 
-    for t_snap in snapshot_times:
-        idx_snap = nearest_index(times, t_snap)
-        state = {s: history[s][idx_snap] for s in species}
-        total = sum(state[s] * len(s) for s in species)
+def plot_species_trajectory(times, history, species, sol=None, filename_prefix="species_trajectory", pool=None,
+                            workers=PLOT_WORKERS):
+    """
+    Save one plot per species of its SSA trajectory (and ODE solution if given).
+    The trajectory is reduced to its min/max per pixel before it is drawn.
 
-        fig, ax = plt.subplots(figsize=(8, 5))
-        bottom = np.zeros(len(groups))
+    :param pool: optional pool from plot_pool(); species are split over its workers
+    :param workers: number of workers of the pool (None for one per CPU), sets the number of chunks
+    :return: list of futures if a pool is given, else None
+    """
+    traj = Trajectory.from_history(times, history, species)
+    pixels = int(TRAJECTORY_FIGSIZE[0] * PLOT_DPI)
+    lines = [traj.decimated(s, pixels=pixels) for s in species]
+    ode_t = sol.t if sol is not None else None
+    ode_y = sol.y[:len(species)] if sol is not None else None
 
-        for s in species:
-            for j, (gname, subspecies) in enumerate(groups.items()):
-                if s in subspecies:
-                    frac = (state[s] * len(s)) / total
-                    ax.bar(gname, frac, bottom=bottom[j], color=color_map[s], label=s)
-                    bottom[j] += frac
+    if pool is None:
+        _render_trajectories(lines, species, ode_t, ode_y, filename_prefix)
+        return None
+
+    futures = []
+    n_chunks = workers if workers is not None else os.cpu_count()
+    for chunk in _chunks(list(range(len(species))), n_chunks):
+        futures.append(pool.submit(
+            _render_trajectories, [lines[i] for i in chunk], [species[i] for i in chunk],
+            ode_t, ode_y[chunk] if ode_y is not None else None, filename_prefix))
+    return futures
+
+def _render_snapshots(snapshot_times, fractions, bottoms, bar_groups, group_names, species):
+    """Stacked bars per size group; the bars are created once and resized per snapshot."""
+    plt = _pyplot()
+    cmap = plt.get_cmap(COLORMAP)
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    bars = ax.bar(bar_groups, np.zeros(len(species)), color=[cmap(i % 20) for i in range(len(species))])
+    ax.set_xlim(-0.5, len(group_names) - 0.5)
+    ax.set_ylim(0, 1.05)
+    ax.set_ylabel("Proportion of total molecules")
+    ax.legend(bars, species, bbox_to_anchor=(1.05, 1), loc="upper left")
+
+    for j, t_snap in enumerate(snapshot_times):
+        for bar, frac, bottom in zip(bars, fractions[:, j], bottoms[:, j]):
+            bar.set_y(bottom)
+            bar.set_height(frac)
 
-        ax.set_ylabel("Proportion of total molecules")
         ax.set_title(f"Species Proportions at t = {t_snap:.1f}")
+        fig.tight_layout()
+        fig.savefig(f"snapshot_proportions_t{t_snap}.png", dpi=PLOT_DPI)
+    plt.close(fig)
+
+def plot_species_snapshots(times, history, species, snapshot_times=None, pool=None):
+    """
+    Save a stacked bar chart of the mass fraction per size group at each snapshot time.
+
+    :param pool: optional pool from plot_pool(); rendering runs as one job there
+    :return: future if a pool is given, else None
+    """
+    if snapshot_times is None:
+        snapshot_times = SNAPSHOT_TIMES
+
+    traj = Trajectory.from_history(times, history, species)
+    snapshots = traj.resample(snapshot_times) # State in force at each snapshot time
 
-        handles, labels = ax.get_legend_handles_labels()
-        unique = dict(zip(labels, handles))
-        ax.legend(unique.values(), unique.keys(), bbox_to_anchor=(1.05, 1), loc="upper left")
+    # A single run is an ensemble of one: (1, species, snapshot times)
+    weights, group_names = size_weight_matrix(species)
+    fractions = mass_fractions(snapshots.T[None], species, weights)["species_mean"]
+    bottoms = stacked_bottoms(fractions, weights)
+    bar_groups = [group_names[g] for g in np.argmax(weights, axis=1)]
 
-        plt.tight_layout()
-        plt.savefig(f"snapshot_proportions_t{t_snap}.png", dpi=PLOT_DPI)
-        plt.close()
\ No newline at end of file
+    args = (list(snapshot_times), fractions, bottoms, bar_groups, group_names, list(species))
+    if pool is None:
+        _render_snapshots(*args)
+        return None
+    return pool.submit(_render_snapshots, *args)
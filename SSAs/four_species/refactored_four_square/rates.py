@@ -3,11 +3,8 @@ from reactions import reactions
 from config import BOND_ENERGY, DUMMY_L2
 import numpy as np
 
-def compute_rates(reactants, products, bond_energy):
-    """Compute forward and backward rates based on diffusion + bond energy"""
-    Dsum = sum(1/np.sqrt(n_particles(s)) for s in reactants)
-    kon = Dsum / DUMMY_L2
-    # Sum bond energies formed in this reaction
+def bond_energy_change(products, bond_energy):
+    """Sum of the bond energies formed when the product of a reaction assembles"""
     species_list = list(products.keys())[0]
     delta_U = 0
     for i in range(len(species_list)):
@@ -15,12 +12,35 @@ def compute_rates(reactants, products, bond_energy):
             pair = tuple(sorted((species_list[i], species_list[j])))
             if pair in bond_energy:
                 delta_U += bond_energy[pair]
+    return delta_U
+
+def compute_rates(reactants, products, bond_energy):
+    """Compute forward and backward rates based on diffusion + bond energy"""
+    Dsum = sum(1/np.sqrt(n_particles(s)) for s in reactants)
+    kon = Dsum / DUMMY_L2
+    # Sum bond energies formed in this reaction
+    delta_U = bond_energy_change(products, bond_energy)
     koff = kon * np.exp(delta_U) # TODO: check whether +- is correct here.
     return kon, koff
 
+def rate_parameters(bond_energy=BOND_ENERGY):
+    """
+    Split every rate into k = k0 * exp(energy / T), where T is the temperature in
+    units of the kBT that BOND_ENERGY is measured in (T = 1 gives the rates below).
+
+    :return: dicts k0 and energy keyed like rates
+    """
+    k0, energy = {}, {}
+    for i, r in enumerate(reactions[::2]):
+        kon, _ = compute_rates(r['reactants'], r['products'], {})
+        rb = reactions[2*i+1]
+        k0[r['k']], energy[r['k']] = kon, 0.0
+        k0[rb['k']], energy[rb['k']] = kon, bond_energy_change(r['products'], bond_energy)
+    return k0, energy
+
 rates = {}
 for i, r in enumerate(reactions[::2]):  # forward reactions
     kf, kb = compute_rates(r['reactants'], r['products'], BOND_ENERGY)
     rates[r['k']] = kf
     rb = reactions[2*i+1]  # backward reaction
-    rates[rb['k']] = kb
\ No newline at end of file
+    rates[rb['k']] = kb
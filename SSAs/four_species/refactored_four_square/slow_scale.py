@@ -0,0 +1,190 @@
+import numpy as np
+import math
+from scipy.special import gammaln
+from ssa import RandomStream, _absorb
+
+"""
+Slow-scale SSA for networks with fast reversible binding pairs.
+
+With the bond energies in config.py, the weak A-B bond binds and unbinds many times
+for every event that changes anything else. Such a pair X + Y <-> XY is in partial
+equilibrium on the time scale of the other reactions: given the conserved totals
+nX + nXY and nY + nXY, the number of XY follows
+
+pi(c) ~ (kf/kb)^c / (c! (nX_tot - c)! (nY_tot - c)!),
+
+the stationary distribution of the pair on its own (the "virtual fast subsystem").
+The slow-scale SSA only steps the slow reactions, with propensities averaged over
+pi, and samples the fast pairs from pi whenever a slow reaction fires.
+
+Pairs are re-detected at every slow event, so a pair drops out of the fast set
+once its flicker is no longer much faster than the rest of the network.
+"""
+
+def find_reversible_pairs(network):
+    """
+    Find the reaction pairs X + Y <-> XY in a network.
+
+    :param network: CompiledNetwork
+    :return: list of (forward index, backward index, x index, y index, xy index)
+    """
+    pairs = []
+    for rf in range(network.n_reactions):
+        x_idx, y_idx = network.reactants[rf, 0], network.reactants[rf, -1]
+        if network.reactants.shape[1] < 2 or y_idx < 0 or x_idx == y_idx:
+            continue
+        products = np.nonzero(network.stoich[rf] > 0)[0]
+        if len(products) != 1:
+            continue
+        for rb in range(network.n_reactions):
+            if np.array_equal(network.stoich[rb], -network.stoich[rf]):
+                pairs.append((rf, rb, x_idx, y_idx, products[0]))
+                break
+    return pairs
+
+def pair_distribution(kf, kb, x_total, y_total):
+    """
+    Stationary distribution of c = #XY for an isolated pair X + Y <-> XY.
+
+    :param kf, kb: binding and unbinding rate constants
+    :param x_total, y_total: conserved totals nX + nXY and nY + nXY
+    :return: array pi(c) for c = 0..min(x_total, y_total)
+    """
+    c = np.arange(min(x_total, y_total) + 1)
+    log_w = c * math.log(kf / kb) - gammaln(c + 1) - gammaln(x_total - c + 1) - gammaln(y_total - c + 1)
+    w = np.exp(log_w - log_w.max())
+    return w / w.sum()
+
+def _select_fast_pairs(a, pairs, fast_ratio):
+    """
+    Greedily pick pairs that flicker much faster than everything else.
+    Selected pairs never share species, so their fast subsystems are independent.
+    """
+    candidates = sorted(pairs, key=lambda p: -min(a[p[0]], a[p[1]]))
+    fast, used_species, used_reactions = [], set(), set()
+    for p in candidates:
+        rf, rb, x_idx, y_idx, xy_idx = p
+        flicker = min(a[rf], a[rb])
+        rest = a.sum() - sum(a[r] for r in used_reactions) - a[rf] - a[rb]
+        if flicker <= 0 or flicker < fast_ratio * rest:
+            break
+        if used_species.isdisjoint((x_idx, y_idx, xy_idx)):
+            fast.append(p)
+            used_species.update((x_idx, y_idx, xy_idx))
+            used_reactions.update((rf, rb))
+    return fast
+
+def _sample_fast(grids, counts, stream, reactants=()):
+    """
+    Draw the state of every fast pair from its stationary distribution, weighted by
+    the propensity of a slow reaction with the given reactants if it is about to fire.
+    """
+    for pi, values in grids:
+        inside = [s_idx for s_idx in reactants if s_idx in values]
+        weights = pi * np.prod([values[s_idx] for s_idx in inside], axis=0) if inside else pi
+        c = np.searchsorted(np.cumsum(weights), stream.uniform() * weights.sum())
+        for s_idx, v in values.items():
+            counts[s_idx] = v[c]
+
+def slow_scale_ssa(initial_counts, t_max, species, network, fast_ratio=100.0,
+                   max_steps=int(1e7), observers=(), record_history=True, rng=None):
+    """
+    Runs the slow-scale SSA until t_max or max_steps slow events.
+
+    :param initial_counts: initial species counts
+    :param t_max: simulation time
+    :param species: list of species names
+    :param network: CompiledNetwork
+    :param fast_ratio: a pair is fast if both of its directions fire at least this many
+                       times more often than all remaining reactions together
+    :param max_steps: maximum number of slow events
+    :param observers: as in ssa.gillespie_ssa
+    :param record_history: if False, history only keeps the initial and final states
+    :param rng: numpy Generator or seed for the random numbers
+    Returns times array and history dict mapping species->list (one entry per slow event)
+    """
+    counts = np.array(initial_counts, dtype=int)
+    stream = rng if isinstance(rng, RandomStream) else RandomStream(rng)
+    pairs = find_reversible_pairs(network)
+    t = 0.0
+
+    history = {s: [counts[idx_s]] for idx_s, s in enumerate(species)}
+    times = [t]
+    for obs in observers:
+        obs.start(t, counts)
+
+    for step in range(max_steps):
+        a = network.propensities(counts)
+        fast = _select_fast_pairs(a, pairs, fast_ratio)
+
+        slow = np.ones(network.n_reactions, dtype=bool)
+        grids = []
+        for rf, rb, x_idx, y_idx, xy_idx in fast:
+            slow[[rf, rb]] = False
+            x_total = counts[x_idx] + counts[xy_idx]
+            y_total = counts[y_idx] + counts[xy_idx]
+            pi = pair_distribution(network.k[rf], network.k[rb], x_total, y_total)
+            c = np.arange(len(pi))
+            grids.append((pi, {x_idx: x_total - c, y_idx: y_total - c, xy_idx: c}))
+
+        # Slow propensities averaged over the fast pairs: E[k * n1 * n2], where n1 and n2
+        # are independent unless they belong to the same pair
+        a_slow = np.zeros(network.n_reactions)
+        for ri in np.nonzero(slow)[0]:
+            value = network.k[ri]
+            remaining = [s_idx for s_idx in network.reactants[ri] if s_idx >= 0]
+            for pi, values in grids:
+                inside = [s_idx for s_idx in remaining if s_idx in values]
+                if inside:
+                    value *= pi @ np.prod([values[s_idx] for s_idx in inside], axis=0)
+                    remaining = [s_idx for s_idx in remaining if s_idx not in values]
+            for s_idx in remaining:
+                value *= counts[s_idx]
+            a_slow[ri] = value
+
+        a0 = a_slow.sum()
+        if a0 <= 0.0:
+            # only the fast pairs are left; they stay in partial equilibrium until t_max.
+            # Without fast pairs nothing can fire any more: the state is absorbing
+            _sample_fast(grids, counts, stream)
+            if not fast:
+                _absorb(observers, t, counts)
+            t = t_max
+            break
+
+        tau = stream.exponential() / a0
+        if t + tau > t_max:
+            t = t_max
+            _sample_fast(grids, counts, stream)
+            break
+        t += tau
+
+        cum = np.cumsum(a_slow)
+        ri = min(np.searchsorted(cum, stream.uniform() * a0), network.n_reactions - 1)
+
+        # Sample the fast pairs at the moment of the slow event; the pairs that take
+        # part in it are sampled conditioned on the reaction firing
+        _sample_fast(grids, counts, stream, [s_idx for s_idx in network.reactants[ri] if s_idx >= 0])
+        counts += network.stoich[ri]
+
+        stop = False
+        for obs in observers:
+            stop |= bool(obs.update(t, counts))
+
+        if record_history:
+            times.append(t)
+            for idx_s, s in enumerate(species):
+                history[s].append(int(counts[idx_s]))
+
+        if stop:
+            break
+
+    for obs in observers:
+        obs.finish(t, counts)
+
+    if times[-1] != t or len(times) == 1:
+        times.append(t)
+        for idx_s, s in enumerate(species):
+            history[s].append(int(counts[idx_s]))
+
+    return np.array(times), history
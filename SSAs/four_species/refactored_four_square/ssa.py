@@ -1,5 +1,60 @@
 import numpy as np
-import random, math
+from network import CompiledNetwork
+from ssa_kernel import BUFFER_SIZE, HAVE_NUMBA, NO_PROPENSITY, run_kernel
+
+class RandomStream:
+    """
+    Exponential and uniform variates drawn in blocks from a numpy Generator.
+
+    Each SSA step needs one waiting time and one uniform. Drawing them one at a time
+    through the interpreter costs more than the rest of the bookkeeping, so they are
+    pre-drawn in large blocks and the buffers are refilled only when they run out.
+    Passing a seed (or a Generator) makes a run reproducible, unlike the global
+    state of the random module.
+    """
+
+    def __init__(self, rng=None, block_size=8192):
+        """
+        :param rng: numpy Generator, seed, or None for a fresh unseeded Generator
+        :param block_size: number of variates drawn per refill
+        """
+        self.rng = rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
+        self.block_size = block_size
+        self._exp = self.rng.standard_exponential(block_size)
+        self._unif = self.rng.random(block_size)
+        self._i_exp = 0
+        self._i_unif = 0
+
+    def exponential(self):
+        """Standard exponential variate (waiting time for unit total propensity)."""
+        if self._i_exp == self.block_size:
+            self._exp = self.rng.standard_exponential(self.block_size)
+            self._i_exp = 0
+        value = self._exp[self._i_exp]
+        self._i_exp += 1
+        return value
+
+    def uniform(self):
+        """Uniform variate on [0, 1)."""
+        if self._i_unif == self.block_size:
+            self._unif = self.rng.random(self.block_size)
+            self._i_unif = 0
+        value = self._unif[self._i_unif]
+        self._i_unif += 1
+        return value
+
+    def refill_exhausted(self):
+        """Refill the buffers that have run out (used by the compiled kernel)."""
+        if self._i_exp == self.block_size:
+            self._exp = self.rng.standard_exponential(self.block_size)
+            self._i_exp = 0
+        if self._i_unif == self.block_size:
+            self._unif = self.rng.random(self.block_size)
+            self._i_unif = 0
+
+    def normal(self, size):
+        """Standard normal variates (drawn directly, they are only needed in vector form)."""
+        return self.rng.standard_normal(size)
 
 def compute_propensities(counts, reactant_lists, rates, reactions):
     """
@@ -32,26 +87,191 @@ def compute_propensities(counts, reactant_lists, rates, reactions):
 
     return a
 
+def _absorb(observers, t, counts):
+    """Tell the observers that care that the run reached an absorbing state at t."""
+    for obs in observers:
+        if hasattr(obs, "absorb"):
+            obs.absorb(t, counts)
+
+def gillespie_ssa(initial_counts, t_max, species, reactions, reactant_lists, stoich_changes, rates,
+                  max_steps=int(1e7), observers=(), record_history=True, rng=None, use_kernel=None):
+    """
+    Runs SSA until t_max or max_steps, without an event log.
+
+    observers: objects with start(t, counts), update(t, counts) and finish(t, counts)
+               methods. update is called after every reaction with the state that
+               holds from t onwards, so statistics (e.g. TimeAverageAccumulator) can be
+               streamed without storing the trajectory. update may return True
+               to stop the run there (e.g. FirstPassageRecorder). If the system
+               reaches a state where no reaction can fire, observers with an
+               absorb(t, counts) method are told so (t is the time the state was
+               entered), and the run is then finished at t_max: the absorbing
+               state holds for the rest of the time window.
+    record_history: if False, history only keeps the initial and final states.
+    rng: numpy Generator or seed for the random numbers (see RandomStream).
+    use_kernel: run the compiled kernel from ssa_kernel.py (default: when Numba is
+                installed). It gives the same trajectory as the Python loop for the
+                same seed; history then holds arrays instead of lists. Observers with
+                a kernel_watch() method (FirstPassageRecorder) are watched inside the
+                kernel and only updated at the events where a predicate holds.
+                Observers with an update_chunk(times, counts) method (GridRecorder),
+                which never stop the run, get each flushed chunk of events at once;
+                the others are updated for every event of the chunk. If one of those
+                can stop the run (can_stop), chunks are one event long, so that every
+                path stops at the same event.
+    Returns times array and history dict mapping species->list
+    """
+    counts = np.array(initial_counts, dtype=int)
+    stream = rng if isinstance(rng, RandomStream) else RandomStream(rng)
+    t = 0.0
+
+    if HAVE_NUMBA if use_kernel is None else use_kernel:
+        network = CompiledNetwork(reactions, reactant_lists, stoich_changes, rates)
+        chunks_t, chunks_c = [np.array([t])], [counts[None, :]]
+        for obs in observers:
+            obs.start(t, counts)
+
+        watched = [obs for obs in observers if hasattr(obs, "kernel_watch") and obs.kernel_watch() is not None]
+        chunked = [obs for obs in observers if hasattr(obs, "update_chunk")
+                   and not any(obs is w for w in watched)]
+        per_event = [obs for obs in observers if not any(obs is o for o in watched + chunked)]
+
+        def on_chunk(out_t, out_c, out_r):
+            n_keep = None
+            if per_event:
+                for i in range(len(out_t)):
+                    stop = False
+                    for obs in per_event:
+                        stop |= bool(obs.update(out_t[i], out_c[i]))
+                    if stop:
+                        n_keep = i + 1
+                        break
+            for obs in chunked:
+                obs.update_chunk(out_t[:n_keep], out_c[:n_keep])
+            if record_history:
+                chunks_t.append(out_t[:n_keep].copy())
+                chunks_c.append(out_c[:n_keep].copy())
+            return n_keep
+
+        def watch():
+            arrays = [obs.kernel_watch() for obs in watched]
+            if not arrays:
+                return None
+            return tuple(np.concatenate(parts) for parts in zip(*arrays))
+
+        def on_watch(t_event, counts_event):
+            stop = False
+            for obs in watched:
+                stop |= bool(obs.update(t_event, counts_event))
+            return stop
+
+        buffer_size = 1 if any(getattr(obs, "can_stop", False) for obs in per_event) else BUFFER_SIZE
+        t, counts, status = run_kernel(counts, t_max, network, stream, max_steps=max_steps,
+                                       buffer_size=buffer_size, on_chunk=on_chunk, watch=watch, on_watch=on_watch)
+        if status == NO_PROPENSITY:
+            _absorb(observers, t, counts)
+            t = t_max
+        for obs in observers:
+            obs.finish(t, counts)
+
+        times = np.concatenate(chunks_t)
+        all_counts = np.concatenate(chunks_c)
+        if times[-1] != t or len(times) == 1:
+            times = np.append(times, t)
+            all_counts = np.vstack([all_counts, counts])
+        return times, {s: all_counts[:, idx_s] for idx_s, s in enumerate(species)}
+
+    history = {s: [counts[idx_s]] for idx_s, s in enumerate(species)}
+    times = [t]
+    for obs in observers:
+        obs.start(t, counts)
+
+    for step in range(max_steps):
+        a = compute_propensities(counts, reactant_lists, rates, reactions)
+        cum = np.cumsum(a) # [a1, a1+a2, a1+a2+a3, ...]
+        a0 = cum[-1]
+        if a0 <= 0.0:
+            # no more reactions possible: the state holds until t_max
+            _absorb(observers, t, counts)
+            t = t_max
+            break
+
+        tau = stream.exponential() / a0
+        r2 = stream.uniform()
+        if t + tau > t_max:
+            # do not apply the reaction that would pass t_max
+            t = t_max
+            break
+        t += tau
+
+        # choose reaction
+        ri = np.searchsorted(cum, r2 * a0)
+        counts += stoich_changes[ri]
+
+        stop = False
+        for obs in observers:
+            stop |= bool(obs.update(t, counts))
+
+        if record_history:
+            times.append(t)
+            for idx_s, s in enumerate(species):
+                history[s].append(int(counts[idx_s]))
+
+        if stop:
+            break
+
+    for obs in observers:
+        obs.finish(t, counts)
+
+    # close the trajectory with the final state
+    if times[-1] != t or len(times) == 1:
+        times.append(t)
+        for idx_s, s in enumerate(species):
+            history[s].append(int(counts[idx_s]))
+
+    return np.array(times), history
+
 def gillespie_ssa_with_log(initial_counts, t_max, species, reactions, reactant_lists, stoich_changes, rates,
-                        max_steps=int(1e7)):
+                        max_steps=int(1e7), rng=None, use_kernel=None):
     counts = np.array(initial_counts, dtype=int)
+    stream = rng if isinstance(rng, RandomStream) else RandomStream(rng)
     t = 0.0
 
+    if HAVE_NUMBA if use_kernel is None else use_kernel:
+        # Same trajectory as the loop below, computed by the compiled kernel
+        network = CompiledNetwork(reactions, reactant_lists, stoich_changes, rates)
+        chunks = []
+        t, counts, status = run_kernel(counts, t_max, network, stream, max_steps=max_steps,
+                                       on_chunk=lambda *chunk: chunks.append([c.copy() for c in chunk]))
+        ev_t = np.concatenate([[0.0]] + [c[0] for c in chunks])
+        ev_c = np.concatenate([np.array(initial_counts, dtype=int)[None, :]] + [c[1] for c in chunks])
+        ev_r = np.concatenate([c[2] for c in chunks]) if chunks else np.array([], dtype=int)
+
+        events = [{"t": ev_t[i + 1], "ri": ri, "name": f"r{ri+1}_{reactions[ri]['k']}", "counts": ev_c[i + 1]}
+                  for i, ri in enumerate(ev_r)]
+        if status == NO_PROPENSITY:
+            events.append({"t": t, "ri": None, "name": "STOP_no_propensity", "counts": counts.copy()})
+        elif t >= t_max:
+            events.append({"t": t_max, "ri": None, "name": "STOP_tmax_reached", "counts": counts.copy()})
+            ev_t = np.append(ev_t, t_max)
+            ev_c = np.vstack([ev_c, counts])
+        return ev_t, {s: ev_c[:, idx_s] for idx_s, s in enumerate(species)}, events
+
     history = {s: [counts[idx_s]] for idx_s, s in enumerate(species)}
     times = [t]
     events = []  # list of dicts: {"t":..., "ri":..., "name":..., "counts": array}
 
     for step in range(max_steps):
         a = compute_propensities(counts, reactant_lists, rates, reactions)
-        a0 = a.sum()
+        cum = np.cumsum(a)
+        a0 = cum[-1]
         if a0 <= 0.0:
             # record final state and break
             events.append({"t": t, "ri": None, "name": "STOP_no_propensity", "counts": counts.copy()})
             break
 
-        r1 = random.random()
-        r2 = random.random()
-        tau = -math.log(r1) / a0
+        tau = stream.exponential() / a0
+        r2 = stream.uniform()
         t += tau
         if t > t_max:
             # stop (we do not apply the reaction that would pass t_max)
@@ -63,7 +283,6 @@ def gillespie_ssa_with_log(initial_counts, t_max, species, reactions, reactant_l
             break
 
         # choose reaction
-        cum = np.cumsum(a)
         target = r2 * a0
         ri = np.searchsorted(cum, target)
         # apply reaction stoichiometry
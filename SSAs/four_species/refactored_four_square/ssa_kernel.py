@@ -0,0 +1,233 @@
+import numpy as np
+
+"""
+Compiled kernel for the direct-method SSA.
+
+The Python engines in ssa.py spend most of their time in interpreter overhead
+(looping over ~36 reactions and 13 species every step). This kernel runs the same
+algorithm over the arrays of a CompiledNetwork and writes events into preallocated
+buffers. It is compiled with Numba when available; ssa.py only uses it in that case
+and otherwise keeps its Python loop.
+
+The kernel consumes the random numbers of a RandomStream in the same order as the
+Python loop and sums propensities in the same order, so both paths give identical
+trajectories for the same seed.
+
+With use_deps=True only the propensities that depend on the species changed by the
+last reaction are recomputed (dependency graph); the values, and so the trajectory,
+are the same.
+
+Linear predicates "sum_j c_j * n_j <op> value" (e.g. those of a FirstPassageRecorder)
+can be watched inside the kernel: it returns right after the first event at which
+one of them holds, so a run stopped by such a predicate ends at that event without
+drawing any random numbers past it, exactly as the Python loop does.
+"""
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """Stand-in decorator: the kernel runs as plain Python."""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+# Reasons for the kernel to return to the driver
+RUNNING = 0          # output buffer full or random numbers used up
+TMAX_REACHED = 1
+NO_PROPENSITY = 2
+MAX_STEPS = 3
+STOPPED = 4          # stopped by on_chunk (e.g. an observer)
+WATCHED = 5          # a watched predicate holds after the last event written
+
+# Events per output chunk
+BUFFER_SIZE = 65536
+
+# Comparison codes of watched predicates
+WATCH_OPS = {">=": 0, "<=": 1, "==": 2, "!=": 3, ">": 4, "<": 5}
+
+@njit(cache=True)
+def _propensity(ri, counts, k, reactants):
+    term = 1.0
+    for j in range(reactants.shape[1]):
+        s_idx = reactants[ri, j]
+        if s_idx >= 0:
+            term *= counts[s_idx]
+    return k[ri] * term
+
+@njit(cache=True)
+def _watch_holds(counts, watch_c, watch_op, watch_v):
+    """True if any watched predicate holds for counts."""
+    for w in range(watch_c.shape[0]):
+        total = 0.0
+        for s_idx in range(counts.shape[0]):
+            total += watch_c[w, s_idx] * counts[s_idx]
+        op = watch_op[w]
+        v = watch_v[w]
+        if ((op == 0 and total >= v) or (op == 1 and total <= v) or (op == 2 and total == v)
+                or (op == 3 and total != v) or (op == 4 and total > v) or (op == 5 and total < v)):
+            return True
+    return False
+
+@njit(cache=True)
+def _direct_method(counts, t, t_max, steps_left, k, reactants, stoich, dep_ptr, dep_idx, use_deps,
+                   a, fresh, exps, i_exp, unifs, i_unif, out_t, out_c, out_r, watch_c, watch_op, watch_v):
+    """
+    Advance the SSA until a stopping condition or until a buffer runs out.
+
+    counts and a are updated in place. fresh is True when a is not yet valid.
+    Returns (t, number of events written, i_exp, i_unif, steps taken, status).
+    """
+    n_reactions = k.shape[0]
+    cum = np.empty(n_reactions)
+    n_out = 0
+    steps = 0
+    last = -1
+
+    while True:
+        if steps >= steps_left:
+            return t, n_out, i_exp, i_unif, steps, MAX_STEPS
+        if n_out == out_t.shape[0]:
+            return t, n_out, i_exp, i_unif, steps, RUNNING
+
+        # Propensities: all of them, or only those touched by the last reaction
+        if fresh or not use_deps or last < 0:
+            for ri in range(n_reactions):
+                a[ri] = _propensity(ri, counts, k, reactants)
+            fresh = False
+        else:
+            for p in range(dep_ptr[last], dep_ptr[last + 1]):
+                ri = dep_idx[p]
+                a[ri] = _propensity(ri, counts, k, reactants)
+
+        # Same summation order as np.cumsum in the Python loop
+        total = 0.0
+        for ri in range(n_reactions):
+            total += a[ri]
+            cum[ri] = total
+        a0 = total
+        if a0 <= 0.0:
+            return t, n_out, i_exp, i_unif, steps, NO_PROPENSITY
+        # Only ask for new random numbers when this step needs them, as the Python loop does
+        if i_exp == exps.shape[0] or i_unif == unifs.shape[0]:
+            return t, n_out, i_exp, i_unif, steps, RUNNING
+
+        tau = exps[i_exp] / a0
+        i_exp += 1
+        r2 = unifs[i_unif]
+        i_unif += 1
+        if t + tau > t_max:
+            return t_max, n_out, i_exp, i_unif, steps, TMAX_REACHED
+        t += tau
+
+        # First reaction with cum >= target (np.searchsorted, side="left")
+        target = r2 * a0
+        ri = 0
+        while cum[ri] < target:
+            ri += 1
+
+        for s_idx in range(counts.shape[0]):
+            counts[s_idx] += stoich[ri, s_idx]
+
+        out_t[n_out] = t
+        out_c[n_out] = counts
+        out_r[n_out] = ri
+        n_out += 1
+        steps += 1
+        last = ri
+
+        if watch_c.shape[0] and _watch_holds(counts, watch_c, watch_op, watch_v):
+            return t, n_out, i_exp, i_unif, steps, WATCHED
+
+def dependency_graph(network):
+    """
+    Reactions whose propensity changes when each reaction fires, in CSR form.
+
+    :param network: CompiledNetwork
+    :return: dep_ptr, dep_idx (reaction r affects dep_idx[dep_ptr[r]:dep_ptr[r+1]])
+    """
+    changed = network.stoich != 0
+    uses = np.zeros((network.n_reactions, network.n_species), dtype=bool)
+    for ri in range(network.n_reactions):
+        for s_idx in network.reactants[ri]:
+            if s_idx >= 0:
+                uses[ri, s_idx] = True
+    affects = changed.astype(int) @ uses.T.astype(int) > 0
+
+    dep_ptr = np.zeros(network.n_reactions + 1, dtype=np.int64)
+    dep_idx = []
+    for ri in range(network.n_reactions):
+        targets = np.nonzero(affects[ri])[0]
+        dep_idx.extend(targets)
+        dep_ptr[ri + 1] = dep_ptr[ri] + len(targets)
+    return dep_ptr, np.array(dep_idx, dtype=np.int64)
+
+def run_kernel(initial_counts, t_max, network, stream, max_steps=int(1e7), use_deps=True,
+               buffer_size=BUFFER_SIZE, on_chunk=None, watch=None, on_watch=None):
+    """
+    Drive the kernel, refilling random numbers and flushing output buffers.
+
+    :param initial_counts: initial species counts
+    :param t_max: simulation time
+    :param network: CompiledNetwork
+    :param stream: RandomStream (its buffers are consumed in place)
+    :param max_steps: maximum number of reactions
+    :param use_deps: only recompute propensities that depend on the last reaction
+    :param buffer_size: number of events per output chunk
+    :param on_chunk: called as on_chunk(times, counts, reaction_indices) for every chunk of events;
+                     returning a number n stops the run after the first n events of the chunk
+    :param watch: function returning the watched predicates as (coefficients (m, n_species),
+                  comparison codes from WATCH_OPS (m,), values (m,)); called at the start
+                  and again after each time one of them held
+    :param on_watch: called as on_watch(t, counts) at the event where a watched predicate
+                     holds (after on_chunk); returning True stops the run there
+    :return: final time, final counts, stop status
+    """
+    counts = np.array(initial_counts, dtype=np.int64)
+    k = network.k
+    reactants = network.reactants
+    stoich = network.stoich
+    dep_ptr, dep_idx = dependency_graph(network)
+
+    a = np.zeros(network.n_reactions)
+    out_t = np.empty(buffer_size)
+    out_c = np.empty((buffer_size, network.n_species), dtype=np.int64)
+    out_r = np.empty(buffer_size, dtype=np.int64)
+
+    def watch_arrays():
+        arrays = watch() if watch is not None else None
+        if arrays is None:
+            return (np.zeros((0, network.n_species)), np.zeros(0, dtype=np.int64), np.zeros(0))
+        c, op, v = arrays
+        return (np.asarray(c, dtype=float).reshape(-1, network.n_species),
+                np.asarray(op, dtype=np.int64), np.asarray(v, dtype=float))
+    watch_c, watch_op, watch_v = watch_arrays()
+
+    t = 0.0
+    steps_left = max_steps
+    fresh = True
+    while True:
+        t, n_out, stream._i_exp, stream._i_unif, steps, status = _direct_method(
+            counts, t, t_max, steps_left, k, reactants, stoich, dep_ptr, dep_idx, use_deps,
+            a, fresh, stream._exp, stream._i_exp, stream._unif, stream._i_unif, out_t, out_c, out_r,
+            watch_c, watch_op, watch_v)
+        fresh = False
+        steps_left -= steps
+        n_keep = None
+        if n_out and on_chunk is not None:
+            n_keep = on_chunk(out_t[:n_out], out_c[:n_out], out_r[:n_out])
+        if status == WATCHED and (n_keep is None or n_keep == n_out):
+            if on_watch is not None and on_watch(t, counts):
+                n_keep = n_out
+            watch_c, watch_op, watch_v = watch_arrays()
+            status = RUNNING
+        if n_keep is not None:
+            return out_t[n_keep - 1], out_c[n_keep - 1].copy(), STOPPED
+        if status != RUNNING:
+            return t, counts, status
+
+        # Same refill order as RandomStream.exponential/uniform
+        stream.refill_exhausted()
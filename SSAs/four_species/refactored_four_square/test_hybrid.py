@@ -0,0 +1,34 @@
+import numpy as np
+from species import species, idx
+from reactions import reactions, reactant_lists, stoich_changes
+from rates import rates
+from network import CompiledNetwork
+from hybrid import hybrid_ssa
+from first_passage import FirstPassageRecorder
+
+"""
+Once every reaction of a hybrid run has turned slow the counts must be exact
+integers again, with the number of each monomer conserved.
+"""
+
+def _monomers(counts):
+    return {m: sum(counts[idx[s]] for s in species if m in s) for m in "ABCD"}
+
+def test_counts_are_integers_once_all_reactions_are_slow():
+    network = CompiledNetwork(reactions, reactant_lists, stoich_changes, rates)
+    initial_counts = np.zeros(len(species), dtype=int)
+    for s, n in {"A": 5000, "B": 5000, "C": 10, "D": 25}.items():
+        initial_counts[idx[s]] = n
+    threshold = 100
+
+    times, history = hybrid_ssa(initial_counts, 0.5, species, network, threshold=threshold, rng=5)
+    final = np.array([history[s][-1] for s in species])
+    # A and B ran low, so no reaction can be fast any more
+    assert final[idx["A"]] < threshold and final[idx["B"]] < threshold
+    np.testing.assert_array_equal(final, np.rint(final))
+    assert _monomers(final) == _monomers(initial_counts)
+
+    # an exact predicate on the final state fires when the run is replayed
+    recorder = FirstPassageRecorder({"final A": f"A == {int(final[idx['A']])}"}, species)
+    hybrid_ssa(initial_counts, 0.5, species, network, threshold=threshold, observers=[recorder], rng=5)
+    assert np.isfinite(recorder.times["final A"])
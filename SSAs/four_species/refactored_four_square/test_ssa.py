@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from species import species, idx
+from reactions import reactions, reactant_lists, stoich_changes
+from rates import rates
+from ssa import RandomStream, gillespie_ssa
+from ssa_kernel import HAVE_NUMBA
+from first_passage import FirstPassageRecorder
+from trajectory import GridRecorder
+
+"""
+The compiled kernel and the Python loop of gillespie_ssa must give the same run for
+the same seed, including where an observer stops it and how many random numbers
+were drawn up to that point.
+"""
+
+def _initial_counts():
+    counts = np.zeros(len(species), dtype=int)
+    for s in "ABCD":
+        counts[idx[s]] = 50
+    return counts
+
+def _run(use_kernel, predicates, record_history=True):
+    stream = RandomStream(7)
+    recorder = FirstPassageRecorder(predicates, species, stop_when_all=True)
+    times, history = gillespie_ssa(_initial_counts(), 1e6, species, reactions, reactant_lists,
+                                   stoich_changes, rates, observers=[recorder],
+                                   record_history=record_history, rng=stream, use_kernel=use_kernel)
+    return times, history, recorder, stream
+
+def _assert_same(kernel, python):
+    times_k, history_k, recorder_k, stream_k = kernel
+    times_p, history_p, recorder_p, stream_p = python
+    np.testing.assert_array_equal(times_k, times_p)
+    for s in species:
+        np.testing.assert_array_equal(np.asarray(history_k[s]), np.asarray(history_p[s]))
+    assert recorder_k.times == recorder_p.times
+    assert (stream_k._i_exp, stream_k._i_unif) == (stream_p._i_exp, stream_p._i_unif)
+    np.testing.assert_array_equal(stream_k._exp, stream_p._exp)
+    np.testing.assert_array_equal(stream_k._unif, stream_p._unif)
+    # the next numbers drawn are the same too
+    assert stream_k.exponential() == stream_p.exponential()
+    assert stream_k.uniform() == stream_p.uniform()
+
+@pytest.mark.skipif(not HAVE_NUMBA, reason="the kernel is only used with Numba")
+@pytest.mark.parametrize("predicates", [
+    {"first ABCD": "ABCD >= 1"},
+    {"first AB": "AB >= 1", "few A": "A + AB <= 40"},
+])
+def test_kernel_stops_where_python_stops(predicates):
+    kernel = _run(True, predicates)
+    python = _run(False, predicates)
+    assert np.all(np.isfinite(list(kernel[2].times.values())))
+    _assert_same(kernel, python)
+
+@pytest.mark.skipif(not HAVE_NUMBA, reason="the kernel is only used with Numba")
+def test_kernel_stops_where_python_stops_with_function_predicate():
+    # a function cannot be watched by the kernel, which then hands back every event
+    predicates = {"first ABCD": lambda counts: counts[idx["ABCD"]] >= 1}
+    _assert_same(_run(True, predicates, record_history=False), _run(False, predicates, record_history=False))
+
+@pytest.mark.skipif(not HAVE_NUMBA, reason="the kernel is only used with Numba")
+def test_grid_recorder_same_on_kernel_chunks():
+    # the kernel hands GridRecorder whole chunks (update_chunk), the loop single events
+    grid = np.linspace(0.0, 50.0, 1001)
+    values = []
+    for use_kernel in (True, False):
+        recorder = GridRecorder(grid, len(species))
+        times, history = gillespie_ssa(_initial_counts(), 50.0, species, reactions, reactant_lists,
+                                       stoich_changes, rates, observers=[recorder], rng=3,
+                                       use_kernel=use_kernel)
+        values.append(recorder.values)
+    np.testing.assert_array_equal(values[0], values[1])
+    counts = np.column_stack([history[s] for s in species])
+    np.testing.assert_array_equal(values[1], counts[np.searchsorted(times, grid, side="right") - 1])
@@ -0,0 +1,151 @@
+import numpy as np
+
+"""
+Time-weighted averages of SSA trajectories.
+
+Between two events the state of the system is constant, so an equilibrium average
+must weight each state by how long the system stays in it (the holding time), not
+by how many events it took part in. Averaging over events biases the result towards
+states where reactions fire quickly.
+
+The window is split into blocks of equal duration. The spread of the block means
+gives an error bar that accounts for correlations along the trajectory, and the
+ratio of the time-weighted variance to the squared error gives an effective number
+of independent samples.
+"""
+
+def history_to_array(history, species):
+    """
+    Stack a history dict into a 2D array.
+
+    :param history: dict mapping species -> list of counts
+    :param species: list of species names (sets the column order)
+    :return: array of shape (n_events, n_species)
+    """
+    return np.column_stack([np.asarray(history[s]) for s in species])
+
+def _summarize(block_sums, sq_sum, edges):
+    """Turn block integrals into means, error bars and effective sample sizes."""
+    duration = edges[-1] - edges[0]
+    block_means = block_sums / np.diff(edges)[:, None]
+    mean = block_sums.sum(axis=0) / duration
+    var = np.maximum(sq_sum / duration - mean**2, 0.0)
+
+    n_blocks = len(block_means)
+    stderr = block_means.std(axis=0, ddof=1) / np.sqrt(n_blocks) if n_blocks > 1 else np.full_like(mean, np.nan)
+
+    # Number of independent samples that would give the same error bar
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ess = np.where(stderr > 0, var / stderr**2, np.nan)
+
+    return {
+        "mean": mean,
+        "std": np.sqrt(var),
+        "stderr": stderr,
+        "ess": ess,
+        "block_means": block_means,
+    }
+
+def time_weighted_stats(times, counts, t_start=None, t_end=None, n_blocks=20):
+    """
+    Time-weighted mean, block-averaged error bar and effective sample size of a trajectory.
+
+    The state counts[i] holds on [times[i], times[i+1]). Block integrals are read off
+    the cumulative integral of the piecewise-constant trajectory, so everything is
+    vectorized over events and species.
+
+    :param times: 1D array of event times (the last entry closes the final holding time)
+    :param counts: array of shape (n_events, n_species), or 1D for a single species
+    :param t_start, t_end: averaging window (defaults to the whole trajectory)
+    :param n_blocks: number of equal-duration blocks for the error bar
+    :return: dict with arrays "mean", "std", "stderr", "ess" and "block_means"
+    """
+    times = np.asarray(times, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+    if counts.ndim == 1:
+        counts = counts[:, None]
+
+    t_start = times[0] if t_start is None else max(t_start, times[0])
+    t_end = times[-1] if t_end is None else min(t_end, times[-1])
+    if t_end <= t_start:
+        raise ValueError("Averaging window has zero duration")
+
+    # Cumulative integrals of x and x^2 at every event time
+    dt = np.diff(times)[:, None]
+    cum = np.vstack([np.zeros(counts.shape[1]), np.cumsum(counts[:-1] * dt, axis=0)])
+    cum_sq = np.vstack([np.zeros(counts.shape[1]), np.cumsum(counts[:-1]**2 * dt, axis=0)])
+
+    def integral_at(cumulative, t):
+        # Last event at or before each t, plus the part of its holding time up to t
+        i = np.searchsorted(times, t, side="right") - 1
+        return cumulative[i] + counts[i] * (t - times[i])[:, None]
+
+    edges = np.linspace(t_start, t_end, n_blocks + 1)
+    block_sums = np.diff(integral_at(cum, edges), axis=0)
+    sq_ends = integral_at(cum_sq, np.array([t_start, t_end]))
+    sq_sum = sq_ends[1] - sq_ends[0]
+
+    return _summarize(block_sums, sq_sum, edges)
+
+class TimeAverageAccumulator:
+    """
+    Streaming version of time_weighted_stats, meant to be passed to the SSA engines
+    as an observer. Only O(n_blocks * n_species) numbers are kept, whatever the
+    number of events.
+    """
+
+    def __init__(self, n_species, t_start, t_end, n_blocks=20):
+        """
+        :param n_species: number of species in the state vector
+        :param t_start, t_end: averaging window (e.g. skip an initial transient)
+        :param n_blocks: number of equal-duration blocks for the error bar
+        """
+        if t_end <= t_start:
+            raise ValueError("Averaging window has zero duration")
+        self.edges = np.linspace(t_start, t_end, n_blocks + 1)
+        self.block_sums = np.zeros((n_blocks, n_species))
+        self.sq_sum = np.zeros(n_species)
+        self._block = 0
+        self._t = None
+        self._counts = None
+        self._t_last = t_start
+
+    def start(self, t, counts):
+        self._t = t
+        self._counts = np.array(counts, dtype=float)
+
+    def update(self, t, counts):
+        """Close the holding time of the previous state at t; counts holds from t onwards."""
+        self._advance(t)
+        self._counts[:] = counts
+
+    def finish(self, t, counts):
+        self._advance(t)
+
+    def _advance(self, t):
+        edges = self.edges
+        lo = max(self._t, edges[0])
+        hi = min(t, edges[-1])
+        while lo < hi:
+            while edges[self._block + 1] <= lo:
+                self._block += 1
+            seg_end = min(hi, edges[self._block + 1])
+            dt = seg_end - lo
+            self.block_sums[self._block] += self._counts * dt
+            self.sq_sum += self._counts**2 * dt
+            lo = seg_end
+        self._t = t
+        self._t_last = max(self._t_last, min(t, edges[-1]))
+
+    def stats(self):
+        """
+        Statistics over the part of the window covered so far. If the run stopped
+        before the end of the window, the last block is cut at the stopping time.
+
+        :return: dict with arrays "mean", "std", "stderr", "ess" and "block_means"
+        """
+        edges = np.minimum(self.edges, self._t_last)
+        n_blocks = np.count_nonzero(np.diff(edges) > 0)
+        if n_blocks < 1:
+            raise ValueError("Averaging window has zero duration")
+        return _summarize(self.block_sums[:n_blocks], self.sq_sum, edges[:n_blocks + 1])
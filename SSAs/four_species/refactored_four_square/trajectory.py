@@ -0,0 +1,176 @@
+import numpy as np
+from bisect import bisect_left, bisect_right
+from decimate import MinMaxPyramid, decimate
+
+class Trajectory:
+    """
+    Piecewise-constant SSA trajectory: the state counts[i] holds on [times[i], times[i+1]).
+
+    State-at-time queries use a binary search, so they return the state in force at
+    that time (not the nearest event) in O(log n). Time windows are views into the
+    same arrays, so slicing never copies.
+    """
+
+    def __init__(self, times, counts, species):
+        """
+        :param times: 1D array of event times (non-decreasing)
+        :param counts: array (n_events, n_species) with the state after each event
+        :param species: list of species names
+        """
+        self.times = np.asarray(times, dtype=float)
+        self.counts = np.asarray(counts)
+        self.species = list(species)
+        self.index = {s: i for i, s in enumerate(self.species)}
+        self._pyramids = {}
+
+    @classmethod
+    def from_history(cls, times, history, species):
+        """Build a trajectory from the (times, history) returned by the SSA engines."""
+        counts = np.column_stack([np.asarray(history[s]) for s in species])
+        return cls(times, counts, species)
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, s):
+        """Counts of species s at every event (a view)."""
+        return self.counts[:, self.index[s]]
+
+    @property
+    def t_start(self):
+        return self.times[0]
+
+    @property
+    def t_end(self):
+        return self.times[-1]
+
+    def event_index(self, t):
+        """
+        Index of the event whose state holds at time(s) t. Times before the start
+        map to the initial state.
+        """
+        i = np.searchsorted(self.times, t, side="right") - 1
+        return np.maximum(i, 0)
+
+    def state_at(self, t):
+        """
+        State in force at time t.
+
+        :param t: time
+        :return: array of counts (n_species,)
+        """
+        return self.counts[self.event_index(t)]
+
+    def resample(self, grid):
+        """
+        Zero-order-hold resampling onto a time grid, in one vectorized call.
+
+        :param grid: 1D array of times
+        :return: array (len(grid), n_species)
+        """
+        return self.counts[self.event_index(np.asarray(grid, dtype=float))]
+
+    def window(self, t0, t1):
+        """
+        Part of the trajectory between t0 and t1, without copying. The first event of
+        the window is the one in force at t0, so state queries inside [t0, t1] agree
+        with the full trajectory.
+
+        :return: Trajectory sharing memory with this one
+        """
+        i0 = self.event_index(t0)
+        i1 = np.searchsorted(self.times, t1, side="right")
+        return Trajectory(self.times[i0:i1], self.counts[i0:i1], self.species)
+
+    def pyramid(self, s):
+        """Min/max decimation pyramid of species s, built on first use and kept."""
+        if s not in self._pyramids:
+            self._pyramids[s] = MinMaxPyramid(self[s])
+        return self._pyramids[s]
+
+    def decimated(self, s, t0=None, t1=None, pixels=1000):
+        """
+        About 2 * pixels points of species s on [t0, t1] that keep every extreme,
+        to be plotted with drawstyle="steps-post".
+
+        :param s: species name
+        :param t0, t1: time window (default: the whole trajectory)
+        :param pixels: plot width in pixels
+        :return: t array, y array
+        """
+        t0 = self.t_start if t0 is None else t0
+        t1 = self.t_end if t1 is None else t1
+        return decimate(self.times, self[s], t0, t1, pixels, self.pyramid(s))
+
+class GridRecorder:
+    """
+    SSA observer that records the state in force at each time of a fixed grid, as
+    Trajectory.resample would, without keeping the trajectory.
+
+    Each event fills the grid points it passes with one slice assignment; a chunk
+    of events from the compiled kernel (update_chunk) is placed on the grid with one
+    searchsorted. When the run is absorbed (no reaction can fire) the rest of the
+    grid is filled in one step at finish; absorbed_at holds the absorption time (nan
+    otherwise). The values are integers for the integer engines and real numbers
+    for engines with real-valued counts (hybrid_ssa), so nothing is truncated.
+    """
+
+    def __init__(self, t_grid, n_species, dtype=None):
+        """
+        :param t_grid: sorted output times
+        :param n_species: number of species
+        :param dtype: dtype of the recorded values (None: int64, or float64 if the
+                      run starts from real-valued counts)
+        """
+        self.t = np.asarray(t_grid, dtype=float)
+        self.dtype = dtype
+        self.values = np.zeros((len(self.t), n_species), dtype=np.int64 if dtype is None else dtype)
+        self.n_filled = 0  # grid points before the end of the run
+        self.absorbed_at = np.nan
+        self.final_counts = None
+        self._state = None
+
+    def start(self, t, counts):
+        if self.dtype is None and not np.issubdtype(np.asarray(counts).dtype, np.integer):
+            self.values = self.values.astype(float)
+        self.n_filled = bisect_left(self.t, t)
+        self._state = np.array(counts)
+
+    def update(self, t, counts):
+        # grid points before t still see the previous state
+        j = bisect_left(self.t, t, lo=self.n_filled)
+        if j > self.n_filled:
+            self.values[self.n_filled:j] = self._state
+            self.n_filled = j
+        self._state = np.array(counts)
+
+    def update_chunk(self, times, counts):
+        """
+        Same as calling update for every event of a chunk.
+
+        :param times: event times of the chunk (non-decreasing)
+        :param counts: array (n_events, n_species) with the state after each event
+        """
+        if len(times) == 0:
+            return
+        j = max(self.n_filled, bisect_left(self.t, times[-1]))
+        if j > self.n_filled:
+            # last event at or before each grid point (-1: the state before the chunk)
+            last = np.searchsorted(times, self.t[self.n_filled:j], side="right") - 1
+            self.values[self.n_filled:j] = counts[np.maximum(last, 0)]
+            self.values[self.n_filled:j][last < 0] = self._state
+            self.n_filled = j
+        self._state = np.array(counts[-1])
+
+    def absorb(self, t, counts):
+        self.absorbed_at = t
+
+    def finish(self, t, counts):
+        j = bisect_right(self.t, t, lo=self.n_filled)
+        self.values[self.n_filled:j] = counts
+        self.n_filled = j
+        self.final_counts = np.array(counts)
+
+    @property
+    def absorbed(self):
+        return not np.isnan(self.absorbed_at)
@@ -1,8 +1,13 @@
 import math
 import random
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "four_species", "refactored_four_square"))
+from decimate import decimate
+
 """
 Testing SSA from paper. The structure we study is the following:
 
@@ -115,10 +120,14 @@ def plot_species(species, k_1, k_2, array_species, deterministic, array_t):
     :param deterministic: solution to determinisic ODE for species
     :param array_t: array of time points
     """
-    plt.figure()  # Start a new figure
-
-    plt.plot(array_t, array_species, label="SSA")
-    plt.plot(array_t, deterministic, label="ODE", linewidth =3)
+    fig = plt.figure()  # Start a new figure
+
+    # Only the min/max per pixel reach Matplotlib
+    pixels = int(fig.get_figwidth() * 200)
+    t_ssa, y_ssa = decimate(array_t, array_species, array_t[0], array_t[-1], pixels)
+    t_ode, y_ode = decimate(array_t, deterministic, array_t[0], array_t[-1], pixels)
+    plt.plot(t_ssa, y_ssa, label="SSA", drawstyle="steps-post")
+    plt.plot(t_ode, y_ode, label="ODE", linewidth =3)
 
     # Labels
     plt.ylim(4980, 5010)
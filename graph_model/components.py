@@ -0,0 +1,325 @@
+import math
+import random
+
+"""
+Component store for the random attachment model.
+
+Vertices are integer IDs: copy c of the vertex type with index j has ID
+c * n_types + j, so the type of a vertex is its ID modulo n_types and no names
+have to be parsed. TargetGraph gives every vertex type one bit and keeps, per
+type, the bitmask of the types it has an edge to in the target graph.
+
+Components are kept in a disjoint-set forest (union by size, path halving), so
+finding the component of a vertex and merging two components take nearly constant
+time instead of the O(n) list removals and set copies of a list of sets. Each root
+holds two bitmasks: the types present in its component, and the types any of them
+has an edge to. Both are merged with an OR, and checking whether two components can
+join is two ANDs (see TargetGraph.can_connect). The roots are kept in a list with
+their positions so a component can be drawn uniformly at random in O(1).
+
+Whether two components can join depends only on their type masks, so the roots are
+also grouped by mask (their signature class). For every class the store keeps the
+number of roots in compatible classes, and from these the number of compatible
+pairs. sample_compatible then draws a mergeable pair directly, uniformly among the
+compatible pairs, which is the pair the plain "draw two components, retry if they
+cannot join" loop would end up with. The number of draws that loop would have
+rejected first is geometric with success probability (compatible pairs) / (all
+pairs) and is returned alongside, so nothing is lost by skipping them. Keeping the
+counts up to date costs O(number of classes present) per merge.
+
+The same count tells when a run is stuck: once no compatible pair is left but some
+component is not a complete copy of the target graph, no merge can ever happen
+again (a kinetic trap). trapped checks this after every merge at no extra cost and
+trap_report describes the partial assemblies left over.
+
+The store also keeps the member list of each component, so a component can be split
+again (see split, used by kinetics.py for bond breaking). A union-find forest cannot
+undo a union, so splitting rebuilds the forest for the members of that component
+only, which costs O(size of the component).
+"""
+
+class TargetGraph:
+    def __init__(self, vertices, edges):
+        """
+        :param vertices: list of vertex types of the target graph
+        :param edges: list of edges (u, v) between vertex types
+        """
+        self.vertices = list(vertices)
+        self.n_types = len(self.vertices)
+        self.full_mask = (1 << self.n_types) - 1  # a complete copy has every type
+        self.type_index = {v: j for j, v in enumerate(self.vertices)}
+        self.edges = list(edges)
+
+        # adjacency[j]: bitmask of the types joined to type j by an edge
+        self.adjacency = [0] * self.n_types
+        for u, v in self.edges:
+            ju, jv = self.type_index[u], self.type_index[v]
+            self.adjacency[ju] |= 1 << jv
+            self.adjacency[jv] |= 1 << ju
+
+    def base_label(self, i):
+        """Type index of vertex ID i."""
+        return i % self.n_types
+
+    def types(self, mask):
+        """Vertex types whose bits are set in mask."""
+        return [v for j, v in enumerate(self.vertices) if mask >> j & 1]
+
+    def connected(self, mask):
+        """Check if the vertex types in mask form a connected subgraph of the target graph."""
+        if not mask:
+            return False
+        seen = frontier = mask & -mask  # start from the lowest type
+        while frontier:
+            low = frontier & -frontier
+            frontier ^= low
+            new = self.adjacency[low.bit_length() - 1] & mask & ~seen
+            seen |= new
+            frontier |= new
+        return seen == mask
+
+    def connected_masks(self):
+        """Masks of every connected set of vertex types (2^n_types checks, small targets only)."""
+        return [mask for mask in range(1, self.full_mask + 1) if self.connected(mask)]
+
+    def class_name(self, mask):
+        """Name of a signature class, e.g. 'ABD' for the types A, B and D."""
+        return "".join(str(v) for v in self.types(mask))
+
+    def vertex_id(self, vertex, copy):
+        """ID of the given copy of a vertex type."""
+        return copy * self.n_types + self.type_index[vertex]
+
+    def name(self, i):
+        """Readable name of vertex ID i, e.g. '3_1' for copy 1 of vertex 3."""
+        return f"{self.vertices[i % self.n_types]}_{i // self.n_types}"
+
+    @staticmethod
+    def can_connect(mask1, mask2, reach1):
+        """
+        Check if two components can be joined: they share no vertex type and at
+        least one edge of the target graph joins a type of one to a type of the other.
+
+        :param mask1: bitmask of the types in the first component
+        :param mask2: bitmask of the types in the second component
+        :param reach1: bitmask of the types adjacent to the first component
+        :return: True if the components can be joined, False otherwise
+        """
+        return not (mask1 & mask2) and bool(reach1 & mask2)
+
+class ComponentStore:
+    def __init__(self, target, n_copies):
+        """
+        :param target: TargetGraph
+        :param n_copies: number of copies of each vertex type
+        """
+        self.target = target
+        n = target.n_types * n_copies
+        self.parent = list(range(n))
+        self.size = [1] * n
+        # valid at roots only
+        self.labels = [1 << target.base_label(i) for i in range(n)]
+        self.reach = [target.adjacency[target.base_label(i)] for i in range(n)]
+        self.members = [[i] for i in range(n)]
+        self.roots = list(range(n))
+        self.root_pos = list(range(n))  # position of each root in self.roots
+
+        # Roots grouped by type mask (signature class)
+        self.class_roots = {}  # mask -> list of roots
+        self.class_pos = [0] * n  # position of each root in its class list
+        self.partner_weight = {}  # mask -> number of roots in compatible classes
+        self.n_compatible = 0  # number of unordered pairs of roots that can join
+        for i in range(n):
+            self._add_root(i)
+
+    def __len__(self):
+        """Number of components."""
+        return len(self.roots)
+
+    def find(self, i):
+        """Root of the component of vertex ID i (with path halving)."""
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def base_labels(self, root):
+        """Bitmask of the vertex types in the component with this root."""
+        return self.labels[root]
+
+    def can_connect(self, r1, r2):
+        """Check if the components with roots r1 and r2 can be joined."""
+        return self.target.can_connect(self.labels[r1], self.labels[r2], self.reach[r1])
+
+    @property
+    def trapped(self):
+        """True if no pair can join but not every component is a complete copy."""
+        return not self.n_compatible and set(self.class_roots) != {self.target.full_mask}
+
+    def trap_report(self):
+        """
+        Summary of the assemblies left when the run is trapped.
+
+        :return: dict with the number of components, the number of complete copies,
+                 and for each kind of partial assembly (signature class) its vertex
+                 types, the types it is missing, and how many there are
+        """
+        full = self.target.full_mask
+        partial = [{"types": self.target.types(mask),
+                    "missing": self.target.types(full & ~mask),
+                    "count": len(members)}
+                   for mask, members in self.class_roots.items() if mask != full]
+        partial.sort(key=lambda entry: -entry["count"])
+        return {"n_components": len(self.roots),
+                "n_complete": len(self.class_roots.get(full, [])),
+                "partial": partial}
+
+    def n_pairs(self):
+        """Number of unordered pairs of components."""
+        return len(self.roots) * (len(self.roots) - 1) // 2
+
+    def sample_roots(self, k=2, rng=random):
+        """k distinct components, uniformly at random."""
+        return rng.sample(self.roots, k)
+
+    def _partners(self, mask, reach):
+        """Classes present that are compatible with the class of this mask and reach."""
+        can_connect = self.target.can_connect
+        return [other for other in self.class_roots if can_connect(mask, other, reach)]
+
+    def _add_root(self, r):
+        """Put root r in its signature class and update the pair counts."""
+        mask = self.labels[r]
+        partners = self._partners(mask, self.reach[r])
+        if mask not in self.class_roots:
+            self.class_roots[mask] = []
+            self.partner_weight[mask] = sum(len(self.class_roots[c]) for c in partners)
+        self.class_pos[r] = len(self.class_roots[mask])
+        self.class_roots[mask].append(r)
+        for c in partners:
+            self.partner_weight[c] += 1
+        self.n_compatible += self.partner_weight[mask]
+
+    def _remove_root(self, r):
+        """Take root r out of its signature class and update the pair counts."""
+        mask = self.labels[r]
+        members = self.class_roots[mask]
+        last = members.pop()
+        if last != r:
+            members[self.class_pos[r]] = last
+            self.class_pos[last] = self.class_pos[r]
+        self.n_compatible -= self.partner_weight[mask]
+        for c in self._partners(mask, self.reach[r]):
+            self.partner_weight[c] -= 1
+        if not members:
+            del self.class_roots[mask]
+            del self.partner_weight[mask]
+
+    def sample_compatible(self, rng=random):
+        """
+        Draw a pair of components that can join, uniformly among such pairs.
+
+        :param rng: random.Random instance (or the random module)
+        :return: (r1, r2, rejections), rejections being the number of uniform
+                 draws of two components the plain retry loop would have rejected first
+        """
+        if not self.n_compatible:
+            raise ValueError("No pair of components can be joined")
+
+        # Ordered class pair (c1, c2) with weight N_c1 * N_c2, then a root of each
+        target = rng.randrange(2 * self.n_compatible)
+        for c1, members in self.class_roots.items():
+            target -= len(members) * self.partner_weight[c1]
+            if target < 0:
+                break
+        target = rng.randrange(self.partner_weight[c1])
+        for c2 in self._partners(c1, self.reach[self.class_roots[c1][0]]):
+            target -= len(self.class_roots[c2])
+            if target < 0:
+                break
+        r1 = self.class_roots[c1][rng.randrange(len(self.class_roots[c1]))]
+        r2 = self.class_roots[c2][rng.randrange(len(self.class_roots[c2]))]
+
+        p = self.n_compatible / self.n_pairs()
+        rejections = 0 if p >= 1 else int(math.log(1.0 - rng.random()) / math.log1p(-p))
+        return r1, r2, rejections
+
+    def union(self, r1, r2):
+        """
+        Merge the components with roots r1 and r2.
+
+        :return: root of the merged component
+        """
+        if r1 == r2:
+            return r1
+        if self.size[r1] < self.size[r2]:
+            r1, r2 = r2, r1
+        self._remove_root(r1)
+        self._remove_root(r2)
+        self.parent[r2] = r1
+        self.size[r1] += self.size[r2]
+        self.labels[r1] |= self.labels[r2]
+        self.reach[r1] |= self.reach[r2]
+        self.members[r1].extend(self.members[r2])
+        self.members[r2] = None
+        self._add_root(r1)
+        self._drop_root(r2)
+        return r1
+
+    def _drop_root(self, r):
+        """Remove r from the root list by swapping in the last root."""
+        pos = self.root_pos[r]
+        last = self.roots.pop()
+        if last != r:
+            self.roots[pos] = last
+            self.root_pos[last] = pos
+
+    def split(self, root, mask):
+        """
+        Split the component with this root into its vertices whose types are in mask
+        and the rest. Both parts must be non-empty; whether they are connected is up
+        to the caller.
+
+        :param root: root of the component
+        :param mask: bitmask of the vertex types that go to the first part
+        :return: roots of the two parts
+        """
+        members = self.members[root]
+        parts = ([v for v in members if mask >> self.target.base_label(v) & 1],
+                 [v for v in members if not mask >> self.target.base_label(v) & 1])
+        if not parts[0] or not parts[1]:
+            raise ValueError("Both parts of a split must be non-empty")
+
+        self._remove_root(root)
+        self._drop_root(root)
+        new_roots = []
+        for part in parts:
+            r = part[0]
+            labels, reach = 0, 0
+            for v in part:
+                self.parent[v] = r
+                labels |= 1 << self.target.base_label(v)
+                reach |= self.target.adjacency[self.target.base_label(v)]
+            self.size[r] = len(part)
+            self.labels[r], self.reach[r], self.members[r] = labels, reach, part
+            self.root_pos[r] = len(self.roots)
+            self.roots.append(r)
+            self._add_root(r)
+            new_roots.append(r)
+        return tuple(new_roots)
+
+    def components(self):
+        """
+        Current components as sets of vertex IDs (O(n); for output, not for the main loop).
+
+        :return: list of sets
+        """
+        groups = {}
+        for i in range(len(self.parent)):
+            groups.setdefault(self.find(i), set()).add(i)
+        return list(groups.values())
+
+    def named_components(self):
+        """Current components as sets of vertex names."""
+        return [{self.target.name(i) for i in comp} for comp in self.components()]
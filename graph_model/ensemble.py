@@ -0,0 +1,110 @@
+import os
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from components import TargetGraph, ComponentStore
+
+"""
+Many independent realisations of the random attachment model, for yield statistics
+as a function of the number of copies and of the target graph.
+
+Each realisation runs the rejection-free loop of simple_random_attachment.py without
+drawing anything and returns a small summary (see run_realisation). Realisations are
+spread over a process pool in batches, and each gets its own random stream spawned
+from one seed (numpy SeedSequence), so an ensemble is reproducible whatever the
+number of workers.
+"""
+
+def run_realisation(vertices, edges, n_copies, seed=None):
+    """
+    Run one realisation until n_copies components are left or the run is trapped.
+
+    :param vertices: list of vertex types of the target graph
+    :param edges: list of edges (u, v) between vertex types
+    :param n_copies: number of copies of each vertex type
+    :param seed: seed (or numpy SeedSequence) of the random stream
+    :return: dict with the number of merges, the number of rejected trials, the
+             final component-size distribution (sizes[k] components of k vertices),
+             the fraction of complete copies and whether the run was trapped
+    """
+    if isinstance(seed, np.random.SeedSequence):
+        seed = int(seed.generate_state(1, np.uint64)[0])
+    rng = random.Random(seed)
+    target = TargetGraph(vertices, edges)
+    store = ComponentStore(target, n_copies)
+
+    merges, rejections = 0, 0
+    while len(store) > n_copies and not store.trapped:
+        root_1, root_2, skipped = store.sample_compatible(rng)
+        rejections += skipped
+        store.union(root_1, root_2)
+        merges += 1
+
+    sizes = [0] * (target.n_types + 1)
+    for mask, members in store.class_roots.items():
+        sizes[bin(mask).count("1")] += len(members)
+    return {"merges": merges,
+            "rejections": rejections,
+            "sizes": sizes,
+            "complete_fraction": sizes[target.n_types] / n_copies if target.connected(target.full_mask) else 0.0,
+            "trapped": store.trapped}
+
+def _run_batch(vertices, edges, n_copies, seeds):
+    return [run_realisation(vertices, edges, n_copies, seed) for seed in seeds]
+
+def run_ensemble(vertices, edges, n_copies, n_runs, seed=None, workers=None):
+    """
+    Run independent realisations in a process pool.
+
+    :param vertices: list of vertex types of the target graph
+    :param edges: list of edges (u, v) between vertex types
+    :param n_copies: number of copies of each vertex type
+    :param n_runs: number of realisations
+    :param seed: seed of the ensemble (None for a fresh one)
+    :param workers: number of worker processes (None for one per CPU, 1 to run here)
+    :return: list of the summaries of run_realisation, in run order
+    """
+    seeds = np.random.SeedSequence(seed).spawn(n_runs)
+    workers = os.cpu_count() if workers is None else workers
+    if workers == 1:
+        return _run_batch(vertices, edges, n_copies, seeds)
+
+    # A few batches per worker, so each task is worth sending to a process
+    n_batches = max(1, min(n_runs, 4 * workers))
+    bounds = np.linspace(0, n_runs, n_batches + 1).astype(int)
+    batches = [seeds[b0:b1] for b0, b1 in zip(bounds[:-1], bounds[1:])]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_batch, vertices, edges, n_copies, batch) for batch in batches]
+        return [summary for future in futures for summary in future.result()]
+
+def summarise(results):
+    """
+    Ensemble statistics of a list of realisation summaries.
+
+    :return: dict with the mean and standard error of the fraction of complete copies,
+             the fraction of trapped runs, the mean numbers of merges and rejected
+             trials, and the mean component-size distribution
+    """
+    complete = np.array([r["complete_fraction"] for r in results])
+    return {"yield_mean": complete.mean(),
+            "yield_stderr": complete.std(ddof=1) / np.sqrt(len(complete)) if len(complete) > 1 else np.nan,
+            "trapped_fraction": np.mean([r["trapped"] for r in results]),
+            "merges_mean": np.mean([r["merges"] for r in results]),
+            "rejections_mean": np.mean([r["rejections"] for r in results]),
+            "sizes_mean": np.mean([r["sizes"] for r in results], axis=0)}
+
+if __name__ == "__main__":
+    # Yield versus number of copies for a few target graphs
+    targets = {
+        "simple (1-2, 1-3, 2-4)": ([1, 2, 3, 4], [(1, 3), (1, 2), (2, 4)]),
+        "four-square": ([1, 2, 3, 4], [(1, 2), (1, 3), (2, 4), (3, 4)]),
+        "triangle": ([1, 2, 3], [(1, 2), (2, 3), (1, 3)]),
+    }
+    n_runs = 2000
+    for name, (vertices, edges) in targets.items():
+        print(name)
+        for n_copies in [2, 3, 10, 30]:
+            stats = summarise(run_ensemble(vertices, edges, n_copies, n_runs, seed=12345))
+            print(f"  n = {n_copies:3d}: yield {stats['yield_mean']:.3f} ± {stats['yield_stderr']:.3f}, "
+                  f"trapped {stats['trapped_fraction']:.3f}, "
+                  f"rejected trials per run {stats['rejections_mean']:.1f}")
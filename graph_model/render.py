@@ -0,0 +1,197 @@
+import os
+import sys
+import numpy as np
+import networkx as nx
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+"""
+Drawing the random attachment model, away from the simulation loop.
+
+The simulation only appends the two vertices of every merge to a MergeLog. The
+renderer replays the log with its own union-find and draws the chosen steps: one
+figure is set up (nodes, labels, layout) and only the node colours, the lines
+and the title change from frame to frame. Each component is drawn as the spanning
+tree of the merges that built it, one line per merge, rather than as a clique. As
+before, the lines only show which vertices are in the same component, not which
+bonds of the target graph were formed.
+
+Frames can be written as PNGs (every k-th step, split over a worker pool, each
+worker replaying the log up to its first frame) or as a single animation.
+Matplotlib is only imported when something is drawn, on the Agg backend.
+"""
+
+FIGSIZE = (6, 6)
+NODE_SIZE = 600
+
+_plt = None
+
+def _pyplot():
+    """Import pyplot on first use, on the non-interactive Agg backend."""
+    global _plt
+    if _plt is None:
+        import matplotlib
+        if "matplotlib.pyplot" not in sys.modules:
+            matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        _plt = plt
+    return _plt
+
+class MergeLog:
+    """Merges of a run, as pairs of vertex IDs (one vertex of each component)."""
+
+    def __init__(self):
+        self.merges = []
+
+    def __len__(self):
+        return len(self.merges)
+
+    def append(self, u, v):
+        self.merges.append((u, v))
+
+@lru_cache(maxsize=None)
+def _layout(names, seed):
+    G_nodes = nx.Graph()
+    G_nodes.add_nodes_from(names)
+    return nx.spring_layout(G_nodes, seed=seed)
+
+def layout(names, seed=42):
+    """
+    Node positions of the drawing, computed once per set of vertices and seed.
+
+    :param names: vertex names, in vertex ID order
+    :return: dict name -> position
+    """
+    return _layout(tuple(names), seed)
+
+def render_pool(workers=None):
+    """
+    Worker pool for rendering frames outside the simulation process.
+
+    :param workers: number of worker processes (None for one per CPU)
+    :return: ProcessPoolExecutor, to be used as a context manager
+    """
+    return ProcessPoolExecutor(max_workers=workers)
+
+def frame_steps(n_merges, every=1):
+    """Steps drawn when drawing every k-th step (the last step is always drawn)."""
+    steps = list(range(0, n_merges + 1, every))
+    if steps[-1] != n_merges:
+        steps.append(n_merges)
+    return steps
+
+class _Replay:
+    """Union-find replay of a merge log, for the colours and lines of each frame."""
+
+    def __init__(self, merges, n_vertices):
+        self.merges = merges
+        self.parent = list(range(n_vertices))
+        self.step = 0
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def advance(self, step):
+        """Apply the merges up to the given step (starting over to go back)."""
+        if step < self.step:
+            self.parent = list(range(len(self.parent)))
+            self.step = 0
+        for u, v in self.merges[self.step:step]:
+            self.parent[self.find(u)] = self.find(v)
+        self.step = step
+
+    def colours(self):
+        """Component number of every vertex, numbered in order of first appearance."""
+        numbers = {}
+        return [numbers.setdefault(self.find(i), len(numbers)) for i in range(len(self.parent))]
+
+class _Frame:
+    """One figure whose node colours, lines and title are updated for every frame."""
+
+    def __init__(self, names, pos):
+        plt = _pyplot()
+        from matplotlib.collections import LineCollection
+        self.names = names
+        self.pos = np.array([pos[name] for name in names])
+        self.fig, self.ax = plt.subplots(figsize=FIGSIZE)
+        self.lines = LineCollection([], colors="black", zorder=1)
+        self.segments = []  # one line per merge, up to the last step drawn
+        self.ax.add_collection(self.lines)
+        G = nx.Graph()
+        G.add_nodes_from(names)
+        self.nodes = nx.draw_networkx_nodes(G, pos=pos, ax=self.ax, node_size=NODE_SIZE,
+                                            node_color=np.zeros(len(names)), cmap=plt.cm.tab10,
+                                            edgecolors="black")
+        nx.draw_networkx_labels(G, pos=pos, ax=self.ax)
+        self.ax.set_axis_off()
+
+    def update(self, replay, step):
+        replay.advance(step)
+        colours = replay.colours()
+        self.nodes.set_array(np.array(colours))
+        self.nodes.set_clim(0, max(max(colours), 1))
+        # only the merges since the last step are added (or the extra ones dropped)
+        del self.segments[step:]
+        self.segments.extend(self.pos[[u, v]] for u, v in replay.merges[len(self.segments):step])
+        self.lines.set_segments(self.segments)
+        self.ax.set_title(f"Step {step}  (components: {len(replay.parent) - step})")
+
+    def close(self):
+        _pyplot().close(self.fig)
+
+def _render_steps(merges, names, pos, steps, filename_prefix):
+    """Write one PNG per step, reusing one figure."""
+    frame = _Frame(names, pos)
+    replay = _Replay(merges, len(names))
+    for step in steps:
+        frame.update(replay, step)
+        frame.fig.savefig(f"{filename_prefix}_{step}.png")
+    frame.close()
+
+def render_frames(log, names, pos, every=1, filename_prefix="step", pool=None, workers=None):
+    """
+    Save a PNG of every k-th step of a run (filename_prefix_<step>.png).
+
+    :param log: MergeLog of the run
+    :param names: vertex names, in vertex ID order
+    :param pos: dict name -> position (see layout)
+    :param every: draw every k-th step
+    :param filename_prefix: prefix of the file names
+    :param pool: executor from render_pool(); the frames are then split among the
+                 workers and a list of futures is returned right away
+    :param workers: number of workers of the pool, as passed to render_pool (None for
+                    one per CPU); the frames are split into that many chunks
+    """
+    steps = frame_steps(len(log), every)
+    if pool is None:
+        _render_steps(log.merges, names, pos, steps, filename_prefix)
+        return None
+
+    n_workers = workers if workers is not None else os.cpu_count()
+    n_chunks = max(1, min(n_workers, len(steps)))
+    bounds = np.linspace(0, len(steps), n_chunks + 1).astype(int)
+    return [pool.submit(_render_steps, log.merges, names, pos, steps[b0:b1], filename_prefix)
+            for b0, b1 in zip(bounds[:-1], bounds[1:])]
+
+def render_animation(log, names, pos, every=1, filename="attachment.gif", fps=2):
+    """
+    Save every k-th step of a run as a single animation.
+
+    :param log: MergeLog of the run
+    :param names: vertex names, in vertex ID order
+    :param pos: dict name -> position (see layout)
+    :param every: draw every k-th step
+    :param filename: output file (.gif, or any format a Matplotlib writer handles)
+    :param fps: frames per second
+    """
+    from matplotlib.animation import FuncAnimation
+    frame = _Frame(names, pos)
+    replay = _Replay(log.merges, len(names))
+    animation = FuncAnimation(frame.fig, lambda step: frame.update(replay, step),
+                              frames=frame_steps(len(log), every), repeat=False)
+    animation.save(filename, fps=fps)
+    frame.close()